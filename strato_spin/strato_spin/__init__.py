@@ -1,4 +1 @@
 __version__ = "0.1.0"
-
-import logging
-logging.basicConfig(level=logging.DEBUG)
@@ -1,19 +1,145 @@
 import click
-from .core.deployer import Deployer
+import json
+import logging
+from .core.tracing import tracer
+
+ACTION_SYMBOLS = {"create": "+", "update": "~", "no-op": "=", "error": "!"}
+
+def parse_limits(ctx, param, values):
+    limits = {}
+    for value in values:
+        name, sep, limit = value.partition("=")
+        if not sep or not limit.isdigit() or int(limit) < 1:
+            raise click.BadParameter(f"expected NAME=N with N >= 1, got {value!r}")
+        limits[name] = int(limit)
+    return limits
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_duration(ctx, param, value):
+    if value is None:
+        return None
+    number, unit = (value[:-1], value[-1]) if value[-1:] in DURATION_UNITS else (value, "s")
+    if not number.isdigit():
+        raise click.BadParameter(f"expected a duration such as 90, 30m, 12h or 7d, got {value!r}")
+    return int(number) * DURATION_UNITS[unit]
+
+def deployer_options(command):
+    options = [
+        click.option("--infra", required=True, help="Path to infra YAML file"),
+        click.option("--flavour", default="prod", help="Environment flavour (dev, uat, prod)"),
+        click.option("--extensions-path", default=None, help="Path to custom extensions directory"),
+        click.option("--max-pool-connections", type=int, default=None, help="HTTP connections per AWS client"),
+        click.option("--max-attempts", type=int, default=None, help="Maximum attempts per AWS API call"),
+        click.option("--retry-mode", type=click.Choice(["legacy", "standard", "adaptive"]), default=None,
+                     help="botocore retry mode"),
+        click.option("--connect-timeout", type=float, default=None, help="AWS connect timeout in seconds"),
+        click.option("--read-timeout", type=float, default=None, help="AWS read timeout in seconds"),
+        click.option("--state-dir", default=None,
+                     help="Directory for the local state file (default: .strato-spin next to the infra file)"),
+        click.option("--max-workers", type=click.IntRange(min=1), default=None,
+                     help="Maximum resources in flight at once (default 16)"),
+        click.option("--build-workers", type=click.IntRange(min=0), default=None,
+                     help="Processes packaging Lambda code ahead of the deploy (default one per CPU, 0 to disable)"),
+        click.option("--platform-limit", "platform_limits", multiple=True, callback=parse_limits,
+                     metavar="PLATFORM=N", help="Concurrency lane for a platform, e.g. azure=2"),
+        click.option("--type-limit", "type_limits", multiple=True, callback=parse_limits,
+                     metavar="TYPE=N", help="Concurrency lane for a resource type, e.g. lambda_function=2"),
+        click.option("--target", "targets", multiple=True,
+                     help="Only this resource and its dependencies; repeatable, accepts globs such as 'api-*'"),
+        click.option("--no-deps", is_flag=True,
+                     help="With --target, skip dependencies and read their outputs from recorded state"),
+        click.option("--trace", "trace_path", default=None,
+                     help="Write a Chrome trace-event JSON file and print the slowest resources and API calls"),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+def make_deployer(infra, flavour, extensions_path, max_pool_connections, max_attempts, retry_mode,
+                  connect_timeout, read_timeout, state_dir, max_workers, build_workers, platform_limits,
+                  type_limits, targets, no_deps, trace_path, refresh=False, refresh_after=None):
+    if trace_path:
+        tracer.enable()
+    client_config = {
+        "max_pool_connections": max_pool_connections,
+        "max_attempts": max_attempts,
+        "retry_mode": retry_mode,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout
+    }
+    concurrency = {
+        "max_workers": max_workers, "build_workers": build_workers, "platforms": platform_limits, "types": type_limits
+    }
+    if no_deps and not targets:
+        raise click.UsageError("--no-deps requires --target")
+    # Imported here so --help does not load the deployer and its dependencies
+    from .core.deployer import Deployer
+    return Deployer(
+        infra, flavour, extensions_path, client_config, state_dir, refresh, concurrency, targets, no_deps,
+        refresh_after
+    )
+
+def write_trace(trace_path):
+    if trace_path:
+        tracer.write_chrome_trace(trace_path)
+        click.echo(tracer.summary())
+        click.echo(f"Trace written to {trace_path}")
+
+def print_plan(entries):
+    for entry in entries:
+        click.echo(f"{ACTION_SYMBOLS[entry['action']]} {entry['name']} ({entry['platform']}/{entry['type']}): {entry['action']}")
+        for field, change in entry["changes"].items():
+            click.echo(f"    {field}: {change['before']!r} -> {change['after']!r}")
+        if entry.get("error"):
+            click.echo(f"    error: {entry['error']}")
+    counts = {action: sum(1 for e in entries if e["action"] == action) for action in ACTION_SYMBOLS}
+    click.echo(
+        f"Plan: {counts['create']} to create, {counts['update']} to update, {counts['no-op']} unchanged, "
+        f"{counts['error']} errored"
+    )
 
 @click.group()
-def cli():
-    pass
+@click.option("--log-level", type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"]), default="INFO",
+              help="Logging level")
+def cli(log_level):
+    logging.basicConfig(level=getattr(logging, log_level))
 
 @cli.command()
-@click.option("--infra", required=True, help="Path to infra YAML file")
-@click.option("--flavour", default="prod", help="Environment flavour (dev, uat, prod)")
-@click.option("--extensions-path", default=None, help="Path to custom extensions directory")
-def deploy(infra, flavour, extensions_path):
+@deployer_options
+@click.option("--fail-fast/--continue-on-error", default=True,
+              help="Stop scheduling on the first failure, or keep deploying independent branches")
+@click.option("--refresh", is_flag=True, help="Ignore recorded state and re-observe every resource")
+@click.option("--refresh-after", callback=parse_duration, default=None, metavar="DURATION",
+              help="Re-observe resources last applied or observed longer ago than this, e.g. 24h")
+@click.option("--engine", type=click.Choice(["thread", "asyncio"]), default="thread",
+              help="Run resources on worker threads, or as coroutines that wait without holding a thread")
+@click.option("--resume", is_flag=True,
+              help="Continue the last failed or interrupted deploy, reusing the resources it completed")
+def deploy(fail_fast, refresh, refresh_after, engine, resume, **options):
     """Deploy cloud infrastructure from YAML configuration"""
-    deployer = Deployer(infra, flavour, extensions_path)
-    deployer.deploy()
+    deployer = make_deployer(refresh=refresh, refresh_after=refresh_after, **options)
+    succeeded = deployer.deploy(fail_fast=fail_fast, engine=engine, resume=resume)
+    write_trace(options["trace_path"])
+    if not succeeded:
+        raise click.ClickException("Deployment failed")
     click.echo("Deployment completed successfully")
 
+@cli.command()
+@deployer_options
+@click.option("--output", "output_format", type=click.Choice(["text", "json"]), default="text",
+              help="Print the plan as text or JSON")
+def plan(output_format, **options):
+    """Preview the changes a deploy would make, without writing anything"""
+    entries = make_deployer(**options).plan()
+    write_trace(options["trace_path"])
+    errored = [entry["name"] for entry in entries if entry["action"] == "error"]
+    if output_format == "json":
+        click.echo(json.dumps(entries, indent=2, default=str))
+    else:
+        print_plan(entries)
+    if errored:
+        raise click.ClickException(f"Could not observe: {', '.join(errored)}")
+
 if __name__ == "__main__":
     cli()
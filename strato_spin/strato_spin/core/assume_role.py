@@ -1,19 +1,26 @@
 import boto3
+import botocore.session
+from botocore.credentials import RefreshableCredentials
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
-def chain_assume_role(role_chain, region="ap-southeast-2"):
+_session_cache = {}
+_session_lock = threading.Lock()
+
+def _assume_chain(role_chain, region):
     session = boto3.Session(region_name=region)
     try:
         # Verify credentials
         sts_client = session.client("sts")
-        sts_client.get_caller_identity()
+        account_id = sts_client.get_caller_identity()["Account"]
         logger.info("Using default credentials from environment")
     except Exception as e:
         logger.error(f"No valid credentials found: {e}")
         raise
 
+    credentials = None
     for role in role_chain:
         try:
             sts_client = session.client("sts")
@@ -22,6 +29,7 @@ def chain_assume_role(role_chain, region="ap-southeast-2"):
                 RoleSessionName=role["session_name"]
             )
             credentials = response["Credentials"]
+            account_id = response["AssumedRoleUser"]["Arn"].split(":")[4]
             session = boto3.Session(
                 aws_access_key_id=credentials["AccessKeyId"],
                 aws_secret_access_key=credentials["SecretAccessKey"],
@@ -32,4 +40,52 @@ def chain_assume_role(role_chain, region="ap-southeast-2"):
         except Exception as e:
             logger.error(f"Failed to assume role {role['role_arn']}: {e}")
             raise
-    return session
+    return session, credentials, account_id
+
+def _refreshable_session(role_chain, region):
+    identity = {}
+
+    def refresh():
+        _, credentials, identity["account_id"] = _assume_chain(role_chain, region)
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat()
+        }
+
+    botocore_session = botocore.session.get_session()
+    botocore_session._credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(),
+        refresh_using=refresh,
+        method="sts-assume-role-chain"
+    )
+    return boto3.Session(botocore_session=botocore_session, region_name=region), identity["account_id"]
+
+def _cache_key(role_chain, region):
+    return (tuple((role["role_arn"], role["session_name"]) for role in role_chain), region)
+
+def _get_cached(role_chain, region):
+    key = _cache_key(role_chain, region)
+    with _session_lock:
+        entry = _session_cache.get(key)
+        if entry is None:
+            if role_chain:
+                entry = _refreshable_session(role_chain, region)
+            else:
+                session, _, account_id = _assume_chain(role_chain, region)
+                entry = (session, account_id)
+            _session_cache[key] = entry
+    return entry
+
+def chain_assume_role(role_chain, region="ap-southeast-2"):
+    """Return a shared session for the role chain, refreshing credentials before they expire."""
+    return _get_cached(role_chain, region)[0]
+
+def get_account_id(role_chain, region="ap-southeast-2"):
+    """Return the account the role chain ends up in."""
+    return _get_cached(role_chain, region)[1]
+
+def clear_session_cache():
+    with _session_lock:
+        _session_cache.clear()
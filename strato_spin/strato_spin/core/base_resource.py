@@ -1,16 +1,30 @@
 from abc import ABC, abstractmethod
+from .diff import diff_fields
 
 class BaseResource(ABC):
     resource_type = None
     platform = None
+    # Bump when the plugin changes how it applies properties, so recorded fingerprints no longer match
+    version = 1
     required_tags = ["Environment", "Owner"]
+    # Additional services the plugin needs clients for, e.g. ["s3"]
+    extra_services = []
+    # Fields the plugin reconciles; a resource whose managed fields match is left untouched.
+    # Left empty, every property is compared against get_existing_properties()
+    managed_fields = []
+    # Observed fields that ${self.<field>} references resolve to when diffing an existing resource
+    self_output_fields = []
 
-    def __init__(self, name, properties, tags, schema, client):
+    def __init__(self, name, properties, tags, schema, client, clients=None):
         self.name = name
         self.properties = properties
         self.tags = tags
         self.schema = schema
         self.client = client
+        self.clients = clients or {}
+        # Index shared by every resource of this type in the account/region, filled by Inventory
+        self.inventory = None
+        self._observations = {}
         self.outputs = {}
         self.self_outputs = {}
         self.validate()
@@ -30,16 +44,34 @@ class BaseResource(ABC):
     def get_schema(cls):
         raise NotImplementedError("Subclasses must implement get_schema")
 
+    @classmethod
+    def list_inventory(cls, client):
+        """List every resource of this type once so exists() can skip its probe call.
+
+        Returns a dict keyed by resource name, or None when the plugin does not prefetch.
+        """
+        return None
+
+    def source_paths(self):
+        """Local files or directories the resource ships; their contents are part of its fingerprint."""
+        return []
+
+    def prebuild(self, executor):
+        """Submit work that needs no upstream outputs, such as packaging, to a process pool when a deploy starts."""
+        return None
+
     @abstractmethod
     def exists(self):
         pass
 
     @abstractmethod
     def create(self):
+        """Create the resource; may return a waiter.Pending instead of blocking until it settles."""
         pass
 
     @abstractmethod
     def update(self, existing_properties):
+        """Reconcile the resource; may return a waiter.Pending like create()."""
         pass
 
     @abstractmethod
@@ -48,3 +80,48 @@ class BaseResource(ABC):
 
     def get_existing_properties(self):
         return {}
+
+    def observe(self, key, fetch):
+        """Memoise a describe/list call for the rest of the deploy; call invalidate() after mutating."""
+        if key not in self._observations:
+            self._observations[key] = fetch()
+        return self._observations[key]
+
+    def invalidate(self, *keys):
+        if not keys:
+            self._observations.clear()
+        for key in keys:
+            self._observations.pop(key, None)
+
+    def desired_value(self, field):
+        if field == "tags":
+            return self.tags
+        return self.properties.get(field, self.schema.get("optional", {}).get(field))
+
+    def normalize(self, field, value):
+        """Canonical form of a field value, so equivalent desired and observed values compare equal."""
+        if field == "tags":
+            return {str(k): str(v) for k, v in (value or {}).items()}
+        return value
+
+    def diff(self, existing_properties):
+        """Field-level diff between the desired and observed managed fields."""
+        for field in self.self_output_fields:
+            if field in existing_properties:
+                self.self_outputs.setdefault(field, existing_properties[field])
+        if not self.managed_fields:
+            # Without declared fields every property is compared, and anything not observed counts
+            # as changed, so plugins that observe nothing are still updated on every deploy
+            fields = list(self.properties) + ["tags"]
+            desired = {field: self.normalize(field, self.desired_value(field)) for field in fields}
+            observed = {
+                field: self.normalize(field, existing_properties[field])
+                for field in fields if field in existing_properties
+            }
+            return diff_fields(desired, observed, keys=fields)
+        desired = {field: self.normalize(field, self.desired_value(field)) for field in self.managed_fields}
+        observed = {field: self.normalize(field, existing_properties.get(field)) for field in self.managed_fields}
+        return diff_fields(desired, observed, keys=self.managed_fields)
+
+    def changed_fields(self, existing_properties):
+        return {path.split(".")[0] for path in self.diff(existing_properties)}
@@ -1,18 +1,78 @@
-import boto3
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.resource import ResourceManagementClient
-from google.cloud import storage
+from .rate_limiter import rate_limiter
+from .tracing import tracer
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+# Standard mode retries throttles with exponential backoff and full jitter
+DEFAULT_RETRIES = {"mode": "standard", "max_attempts": 8}
+
+def build_client_config(settings=None):
+    """Build a botocore Config from the infra file's client_config section."""
+    from botocore.config import Config
+    settings = settings or {}
+    options = {
+        "max_pool_connections": settings.get("max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS),
+        "retries": {
+            "max_attempts": settings.get("max_attempts") or DEFAULT_RETRIES["max_attempts"],
+            "mode": settings.get("retry_mode") or DEFAULT_RETRIES["mode"]
+        }
+    }
+    for timeout in ("connect_timeout", "read_timeout"):
+        if settings.get(timeout) is not None:
+            options[timeout] = settings[timeout]
+    return Config(**options)
+
+def _credential_key(credentials):
+    if isinstance(credentials, dict):
+        return tuple(sorted((k, str(v)) for k, v in credentials.items()))
+    return credentials
+
 class ClientFactory:
+    _clients = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_client(platform, service, credentials=None, config=None, account_id=None):
+        """Return a shared client per (platform, service, region, credentials)."""
+        region = credentials.region_name if platform == "aws" and credentials else None
+        key = (platform, service, region, _credential_key(credentials), config)
+        client = ClientFactory._clients.get(key)
+        if client is None:
+            # boto3 sessions are not thread-safe, so construction is serialised
+            with ClientFactory._lock:
+                client = ClientFactory._clients.get(key)
+                if client is None:
+                    client = ClientFactory._create_client(platform, service, credentials, config, account_id)
+                    ClientFactory._clients[key] = client
+                    logger.debug(f"Created {platform}/{service} client for region {region}")
+        return client
+
+    @staticmethod
+    def clear():
+        with ClientFactory._lock:
+            ClientFactory._clients.clear()
+
     @staticmethod
-    def get_client(platform, service, credentials=None):
+    def _create_client(platform, service, credentials, config, account_id):
+        # Cloud SDKs are imported only when their platform is used; they are slow to import and optional
         if platform == "aws":
+            import boto3
             session = credentials or boto3.Session()
-            return session.client(service)
+            client = session.client(service, config=config or build_client_config())
+            # Plugins build ARNs from client.meta.account_id, which botocore does not provide
+            client.meta.account_id = account_id
+            tracer.instrument_client(client)
+            rate_limiter.instrument_client(client)
+            return client
         elif platform == "azure":
+            try:
+                from azure.identity import DefaultAzureCredential
+                from azure.mgmt.resource import ResourceManagementClient
+            except ImportError as e:
+                raise ValueError(f"Azure resources need azure-identity and azure-mgmt-resource installed: {e}")
             credential = credentials or DefaultAzureCredential()
             if service == "resource_management":
                 subscription_id = credentials.get("subscription_id", "your-subscription-id")
@@ -20,6 +80,10 @@ class ClientFactory:
             else:
                 raise ValueError(f"Unknown Azure service: {service}")
         elif platform == "gcp":
+            try:
+                from google.cloud import storage
+            except ImportError as e:
+                raise ValueError(f"GCP resources need google-cloud-storage installed: {e}")
             if service == "storage":
                 return storage.Client(credentials=credentials, project=credentials.get("project_id", "your-project-id"))
             else:
@@ -1,24 +1,133 @@
-from .assume_role import chain_assume_role
 from .parser import Parser
 from .plugin_registry import PluginRegistry
-from .clients import ClientFactory
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from .clients import ClientFactory, build_client_config
+from .inventory import Inventory
+from .journal import Journal, journal_path
+from .rate_limiter import rate_limiter
+from .scheduler import AsyncDagScheduler, DagScheduler, Deferred
+from .state import StateStore, age_seconds, default_state_path, hash_spec, hash_tree
+from .tracing import tracer
+from .waiter import Pending, Poller
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import fnmatch
 import logging
+import multiprocessing
+import threading
 
 logger = logging.getLogger(__name__)
 
+# API pacing comes from the per-service rate limiter, so workers only bound in-flight resources
+DEFAULT_MAX_WORKERS = 16
+# The asyncio engine keeps waiting resources off the executor, so many more can be in flight
+DEFAULT_MAX_IN_FLIGHT = 256
+ENGINES = ("thread", "asyncio")
+
 class Deployer:
-    def __init__(self, infra_file, flavour=None, extensions_path=None):
+    def __init__(self, infra_file, flavour=None, extensions_path=None, client_config=None,
+                 state_dir=None, refresh=False, concurrency=None, targets=None, no_deps=False,
+                 refresh_after=None):
         self.plugin_registry = PluginRegistry(extensions_path)
-        self.plugin_registry.register_plugins()
-        self.parser = Parser(infra_file, self.plugin_registry, flavour)
-        self.parser.detect_circular_dependencies()
+        with tracer.span("register_plugins"):
+            self.plugin_registry.register_plugins()
+        with tracer.span("parse"):
+            self.parser = Parser(infra_file, self.plugin_registry, flavour)
+            self.parser.detect_circular_dependencies()
         self.resource_outputs = {}
+        self._outputs_lock = threading.Lock()
         self.resources = []
         self.credentials = {}
+        settings = {
+            **self.parser.infra.get("client_config", {}),
+            **{k: v for k, v in (client_config or {}).items() if v is not None}
+        }
+        self.client_settings = settings
+        self._client_config = None
+        rate_limiter.configure(settings.get("rate_limits"))
+        self.concurrency = self._concurrency_settings(concurrency or {})
+        self.poller = Poller()
+        self.targets = list(targets or [])
+        self.no_deps = no_deps
+        self.state = StateStore(default_state_path(infra_file, self.parser.flavour, state_dir))
+        self.journal = Journal(journal_path(self.state.path))
+        # The interrupted run being resumed, with the resources it completed
+        self.checkpoint = None
+        self.refresh = refresh
+        # Seconds after which a recorded resource is re-observed anyway, to catch drift
+        self.refresh_after = refresh_after
+        # hash_tree results for shipped source paths, so prebuild and apply hash each tree once
+        self._source_hashes = {}
+
+    @property
+    def client_config(self):
+        # Built on first use so deploys without AWS resources never import botocore
+        if self._client_config is None:
+            self._client_config = build_client_config(self.client_settings)
+        return self._client_config
+
+    def _concurrency_settings(self, overrides):
+        """Merge the infra file's concurrency section with CLI overrides."""
+        settings = self.parser.infra.get("concurrency", {})
+        return {
+            "max_workers": overrides.get("max_workers") or settings.get("max_workers", DEFAULT_MAX_WORKERS),
+            "max_in_flight": overrides.get("max_in_flight") or settings.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT),
+            # Processes that package ahead of the deploy; None means one per CPU and 0 packages inline
+            "build_workers": overrides["build_workers"] if overrides.get("build_workers") is not None
+            else settings.get("build_workers"),
+            "platforms": {**settings.get("platforms", {}), **overrides.get("platforms", {})},
+            "types": {**settings.get("types", {}), **overrides.get("types", {})}
+        }
+
+    def _lanes(self):
+        lanes = {
+            resource.name: [f"platform:{resource.platform}", f"type:{resource.resource_type}"]
+            for resource in self.resources
+        }
+        limits = {
+            **{f"platform:{platform}": limit for platform, limit in self.concurrency["platforms"].items()},
+            **{f"type:{res_type}": limit for res_type, limit in self.concurrency["types"].items()}
+        }
+        return lanes, limits
+
+    def select_resources(self):
+        """Names matching the --target globs plus, unless no_deps is set, their transitive dependencies."""
+        names = [res["name"] for res in self.parser.resources]
+        if self.checkpoint and not self.targets:
+            # A resume covers the interrupted run's resources, which may have been a --target subset
+            names = [name for name in names if name in self.checkpoint["resources"]]
+        if not self.targets:
+            return set(names)
+        selected = set()
+        for pattern in self.targets:
+            matched = fnmatch.filter(names, pattern)
+            if not matched:
+                raise ValueError(f"No resources match target {pattern}")
+            selected.update(matched)
+        if self.no_deps:
+            return selected
+        stack = list(selected)
+        while stack:
+            for dep in self.parser.dependencies.get(stack.pop(), []):
+                if dep not in selected:
+                    selected.add(dep)
+                    stack.append(dep)
+        return selected
+
+    def _load_external_outputs(self):
+        """With --no-deps, upstream resources outside the selection resolve from recorded state."""
+        selected = {resource.name for resource in self.resources}
+        for name in selected:
+            for dep in self.parser.dependencies.get(name, []):
+                if dep in selected or dep in self.resource_outputs:
+                    continue
+                recorded = self.state.get(dep)
+                if not recorded:
+                    raise ValueError(f"{name} depends on {dep}, which has no recorded outputs; deploy it first or drop --no-deps")
+                self.resource_outputs[dep] = recorded["outputs"]
 
     def initialize_resources(self):
-        sorted_resources = self.parser.topological_sort()
+        selected = self.select_resources()
+        sorted_resources = [res for res in self.parser.topological_sort() if res["name"] in selected]
         for res in sorted_resources:
             platform = res.get("platform", "aws")
             res_type = res["type"]
@@ -26,10 +135,15 @@ class Deployer:
             if not resource_class:
                 raise ValueError(f"Unknown resource type: {platform}/{res_type}")
             client = self.get_client(platform, res_type)
-            schema = self.parser.get_resource_schema(platform, res_type)
-            self.parser.resolve_variables(self.resource_outputs)
+            clients = {
+                service: self.get_service_client(platform, service)
+                for service in resource_class.extra_services
+            }
+            schema = self.plugin_registry.get_schema(platform, res_type)
+            # Upstream references stay unresolved until the resource is ready to deploy
+            properties, tags = self.parser.resolve_resource(res["name"])
             self.resources.append(
-                resource_class(res["name"], res["properties"], res["tags"], schema, client)
+                resource_class(res["name"], properties, tags, schema, client, clients)
             )
 
     def _get_service_name(self, platform, resource_type):
@@ -42,17 +156,33 @@ class Deployer:
                 "kms_key": "kms",
                 "iam_role": "iam",
                 "s3_upload": "s3",
-                "eventbridge_rule": "cloudwatch"
+                "eventbridge_rule": "events"
             },
+            "azure": {
+                "function_app": "resource_management"
+            },
+            "gcp": {
+                "cloud_run": "storage"
+            }
         }
         return service_names.get(platform, {}).get(resource_type)
 
     def get_client(self, platform, resource_type):
+        return self.get_service_client(platform, self._get_service_name(platform, resource_type))
+
+    def get_service_client(self, platform, service):
         if platform == "aws":
+            from .assume_role import chain_assume_role, get_account_id
             role_chain = self.parser.infra.get("assume_roles", [])
             region = self.parser.infra.get("variables", {}).get("region", "ap-southeast-2")
-            session = chain_assume_role(role_chain, region=region)
-            return ClientFactory.get_client(platform, self._get_service_name("aws", resource_type), session)
+            with tracer.span("credentials", region=region):
+                session = chain_assume_role(role_chain, region=region)
+                account_id = get_account_id(role_chain, region=region)
+            return ClientFactory.get_client(
+                platform, service, session,
+                config=self.client_config,
+                account_id=account_id
+            )
         elif platform == "azure":
             credentials = self.parser.infra.get("azure_credentials", {})
             return ClientFactory.get_client(platform, service, credentials)
@@ -62,55 +192,292 @@ class Deployer:
         else:
             raise ValueError(f"Unsupported platform: {platform}")
 
+    def _upstream_outputs(self, name):
+        with self._outputs_lock:
+            return {
+                dep: self.resource_outputs[dep]
+                for dep in self.parser.dependencies.get(name, [])
+                if dep in self.resource_outputs
+            }
+
+    def _spec_hash(self, resource, upstream_outputs):
+        """Fingerprint of everything an apply depends on: resolved spec, plugin version, shipped sources and upstream outputs."""
+        sources = {path: self._source_hash(path) for path in resource.source_paths()}
+        return hash_spec(
+            resource.platform, resource.resource_type, type(resource).version,
+            resource.properties, resource.tags, sources, upstream_outputs
+        )
+
+    def _source_hash(self, path):
+        if path not in self._source_hashes:
+            self._source_hashes[path] = hash_tree(path)
+        return self._source_hashes[path]
+
+    def _needs_refresh(self, recorded):
+        if self.refresh or not recorded:
+            return True
+        if self.refresh_after is None:
+            return False
+        age = age_seconds(recorded)
+        return age is None or age >= self.refresh_after
+
     def deploy_resource(self, resource):
-        try:
-            existing_props = resource.get_existing_properties()
-            if resource.exists() and existing_props == {
-                **resource.properties,
-                "tags": resource.tags
-            }:
+        """Deploy on the thread engine; returns a Deferred while the resource waits on the poller."""
+        with tracer.span(resource.name, "resource", type=resource.resource_type):
+            try:
+                return self._continue_resource(resource, self._apply_resource(resource))
+            except Exception as e:
+                self._record_failure(resource, e)
+                return False
+
+    def _continue_resource(self, resource, step):
+        pending = step["pending"]
+        if pending is not None:
+            future = self.poller.submit(pending)
+            return Deferred(future, lambda settled: self._resume_resource(resource, step, pending, settled))
+        self._finish_resource(resource, step)
+        return True
+
+    def _resume_resource(self, resource, step, pending, settled):
+        with tracer.span(resource.name, "resource", type=resource.resource_type):
+            try:
+                settled.result()
+                step["pending"] = self._follow_up(pending)
+                return self._continue_resource(resource, step)
+            except Exception as e:
+                self._record_failure(resource, e)
+                return False
+
+    def _follow_up(self, pending):
+        """Run the step that follows a settled wait, returning the next Pending if there is one."""
+        return self._as_pending(pending.then()) if pending.then else None
+
+    def _record_failure(self, resource, error):
+        logger.error(f"Failed to deploy resource {resource.name}: {error}")
+        self.journal.failed(resource.name, error)
+
+    async def deploy_resource_async(self, resource, executor):
+        loop = asyncio.get_running_loop()
+        with tracer.span(resource.name, "resource", type=resource.resource_type):
+            try:
+                step = await loop.run_in_executor(executor, self._apply_resource, resource)
+                pending = step["pending"]
+                while pending is not None:
+                    await asyncio.wrap_future(self.poller.submit(pending))
+                    pending = await loop.run_in_executor(executor, self._follow_up, pending)
+                await loop.run_in_executor(executor, self._finish_resource, resource, step)
+                return True
+            except Exception as e:
+                self._record_failure(resource, e)
+                return False
+
+    def _apply_resource(self, resource):
+        """Resolve, diff and create/update a resource, returning what is needed to finish it.
+
+        A create/update may return a Pending condition, which the poller waits on before
+        _finish_resource reads the outputs.
+        """
+        upstream_outputs = self._upstream_outputs(resource.name)
+        resource.properties, resource.tags = self.parser.resolve_resource(resource.name, upstream_outputs)
+        step = {"spec_hash": self._spec_hash(resource, upstream_outputs), "pending": None, "outputs": None}
+        checkpointed = self._checkpointed(resource.name)
+        if checkpointed and checkpointed["spec_hash"] == step["spec_hash"]:
+            logger.info(f"Resource {resource.name} was deployed before the interruption")
+            step["outputs"] = checkpointed["outputs"]
+            return step
+        recorded = self.state.get(resource.name)
+        if not self._needs_refresh(recorded) and recorded["spec_hash"] == step["spec_hash"]:
+            logger.info(f"Resource {resource.name} is unchanged since the last apply")
+            step["outputs"] = recorded["outputs"]
+            return step
+        desired_props = {**resource.properties, "tags": resource.tags}
+        with tracer.span("exists", "phase", resource=resource.name):
+            exists = resource.exists()
+        if exists:
+            with tracer.span("observe", "phase", resource=resource.name):
+                existing_props = resource.get_existing_properties()
+                changes = resource.diff(existing_props)
+            if not changes:
                 logger.info(f"Resource {resource.name} is up-to-date")
-            elif resource.exists():
-                resource.update(existing_props)
-                logger.info(f"Updated resource {resource.name}")
+                step["observed"] = existing_props
             else:
-                resource.create()
-                logger.info(f"Created resource {resource.name}")
-            self.resource_outputs[resource.name] = resource.get_outputs()
-            self.parser.resolve_variables(self.resource_outputs)
-            return True
+                with tracer.span("update", "phase", resource=resource.name):
+                    step["pending"] = self._as_pending(resource.update(existing_props))
+                logger.info(f"Updated resource {resource.name}: {', '.join(changes)}")
+                step["observed"] = desired_props
+        else:
+            with tracer.span("create", "phase", resource=resource.name):
+                step["pending"] = self._as_pending(resource.create())
+            logger.info(f"Created resource {resource.name}")
+            step["observed"] = desired_props
+        return step
+
+    def _as_pending(self, result):
+        return result if isinstance(result, Pending) else None
+
+    def _finish_resource(self, resource, step):
+        outputs = step["outputs"]
+        if outputs is None:
+            with tracer.span("outputs", "phase", resource=resource.name):
+                outputs = resource.get_outputs()
+            self.state.record(resource.name, step["spec_hash"], step["observed"], outputs)
+        self.journal.completed(resource.name, step["spec_hash"], outputs)
+        with self._outputs_lock:
+            self.resource_outputs[resource.name] = outputs
+
+    def _checkpointed(self, name):
+        return self.checkpoint["completed"].get(name) if self.checkpoint else None
+
+    def prefetch_inventory(self, resources):
+        # A partial deploy probes its few resources directly instead of listing whole services
+        if self.targets:
+            return
+        # Resources with recorded state are usually skipped, so they keep their per-resource probes
+        unknown = [
+            resource for resource in resources
+            if not self._checkpointed(resource.name) and self._needs_refresh(self.state.get(resource.name))
+        ]
+        with tracer.span("prefetch_inventory"):
+            Inventory(max_workers=4).prefetch(unknown)
+
+    def _recorded_upstream_outputs(self, name):
+        upstream_outputs = {}
+        for dep in self.parser.dependencies.get(name, []):
+            recorded = self.state.get(dep)
+            if recorded:
+                upstream_outputs[dep] = recorded["outputs"]
+        return upstream_outputs
+
+    def plan_resource(self, resource):
+        # Reads need no ordering, so upstream outputs come from recorded state where known
+        upstream_outputs = self._recorded_upstream_outputs(resource.name)
+        resource.properties, resource.tags = self.parser.resolve_resource(resource.name, upstream_outputs)
+        entry = {
+            "name": resource.name,
+            "platform": resource.platform,
+            "type": resource.resource_type,
+            "action": None,
+            "changes": {}
+        }
+        try:
+            if not resource.exists():
+                entry["action"] = "create"
+            else:
+                existing_props = resource.get_existing_properties()
+                entry["changes"] = resource.diff(existing_props)
+                entry["action"] = "update" if entry["changes"] else "no-op"
         except Exception as e:
-            logger.error(f"Failed to deploy resource {resource.name}: {e}")
+            logger.error(f"Failed to observe resource {resource.name}: {e}")
+            entry["action"] = "error"
+            entry["error"] = str(e)
+        return entry
+
+    def prebuild(self):
+        """Start every selected resource's local build work in a process pool, overlapping with provisioning."""
+        if self.concurrency["build_workers"] == 0:
+            return None
+        # spawn, because forking a process that already runs threads is unsafe
+        executor = ProcessPoolExecutor(
+            max_workers=self.concurrency["build_workers"], mp_context=multiprocessing.get_context("spawn")
+        )
+        for resource in self.resources:
+            if self._may_apply(resource):
+                resource.prebuild(executor)
+        return executor
+
+    def _may_apply(self, resource):
+        """Whether the deploy is expected to create or update a resource, judged from recorded state alone."""
+        if self._checkpointed(resource.name):
             return False
+        recorded = self.state.get(resource.name)
+        if self._needs_refresh(recorded):
+            return True
+        # Unchanged upstreams are skipped too, so their recorded outputs are what the apply will see
+        upstream_outputs = self._recorded_upstream_outputs(resource.name)
+        resource.properties, resource.tags = self.parser.resolve_resource(resource.name, upstream_outputs)
+        return recorded["spec_hash"] != self._spec_hash(resource, upstream_outputs)
 
-    def deploy(self):
+    def plan(self):
+        """Observe every resource concurrently and return the create/update/no-op plan without writing."""
         self.initialize_resources()
-        dependency_groups = []
-        current_group = []
-        processed = set()
+        if not self.resources:
+            return []
+        if not self.targets:
+            Inventory(max_workers=4).prefetch(self.resources)
+        with ThreadPoolExecutor(max_workers=min(self.concurrency["max_workers"], len(self.resources))) as executor:
+            return list(executor.map(self.plan_resource, self.resources))
 
-        for resource in self.resources:
-            resource_deps = set(self.parser.dependencies[resource.name])
-            if not resource_deps.issubset(processed):
-                if current_group:
-                    dependency_groups.append(current_group)
-                current_group = [resource]
+    def deploy(self, fail_fast=True, engine="thread", resume=False):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        if resume:
+            self.checkpoint = self.journal.load()
+            if not self.checkpoint or self.checkpoint["succeeded"]:
+                logger.info("No interrupted deploy to resume, deploying everything")
+                self.checkpoint = None
             else:
-                current_group.append(resource)
-            processed.add(resource.name)
-        if current_group:
-            dependency_groups.append(current_group)
-
-        max_workers = min(4, len(self.resources))
-        for group in dependency_groups:
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_resource = {
-                    executor.submit(self.deploy_resource, resource): resource
-                    for resource in group
-                }
-                for future in as_completed(future_to_resource):
-                    resource = future_to_resource[future]
-                    if not future.result():
-                        logger.error(f"Deployment failed for {resource.name}, aborting")
-                        return
+                logger.info(
+                    f"Resuming: {len(self.checkpoint['completed'])} of {len(self.checkpoint['resources'])} "
+                    f"resources completed before the interruption"
+                )
+        self.initialize_resources()
+        if not self.resources:
+            logger.info("No resources to deploy")
+            return True
+        self._load_external_outputs()
+        builds = self.prebuild()
+        self.journal.start([resource.name for resource in self.resources], resume=self.checkpoint is not None)
+
+        try:
+            self.prefetch_inventory(self.resources)
+            if engine == "asyncio":
+                results = asyncio.run(self._run_async(fail_fast))
+            else:
+                results = self._run_threads(fail_fast)
+        finally:
+            self.state.flush()
+            self.poller.stop()
+            if builds:
+                builds.shutdown(wait=False, cancel_futures=True)
+        throttles = {service: count for service, count in rate_limiter.report().items() if count}
+        if throttles:
+            logger.info(f"Throttled API calls per service: {throttles}")
+        failed = [name for name, succeeded in results.items() if not succeeded]
+        self.journal.finish(not failed)
+        if failed:
+            logger.error(f"Deployment failed or skipped for: {', '.join(failed)}")
+            return False
         logger.info("Deployment completed successfully")
+        return True
+
+    def _run_threads(self, fail_fast):
+        resources_by_name = {resource.name: resource for resource in self.resources}
+        lanes, lane_limits = self._lanes()
+        scheduler = DagScheduler(
+            self.parser.dependencies,
+            max_workers=min(self.concurrency["max_workers"], len(self.resources)),
+            fail_fast=fail_fast,
+            lanes=lanes,
+            lane_limits=lane_limits
+        )
+        return scheduler.run(
+            resources_by_name,
+            lambda name: self.deploy_resource(resources_by_name[name])
+        )
+
+    async def _run_async(self, fail_fast):
+        resources_by_name = {resource.name: resource for resource in self.resources}
+        lanes, lane_limits = self._lanes()
+        scheduler = AsyncDagScheduler(
+            self.parser.dependencies,
+            max_in_flight=self.concurrency["max_in_flight"],
+            fail_fast=fail_fast,
+            lanes=lanes,
+            lane_limits=lane_limits
+        )
+        # Blocking SDK calls share a small pool; waits happen on the event loop
+        with ThreadPoolExecutor(max_workers=self.concurrency["max_workers"]) as executor:
+            return await scheduler.run(
+                resources_by_name,
+                lambda name: self.deploy_resource_async(resources_by_name[name], executor)
+            )
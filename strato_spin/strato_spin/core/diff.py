@@ -0,0 +1,46 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = "(known after apply)"
+
+def is_unresolved(value):
+    if isinstance(value, str):
+        return "${resources." in value
+    elif isinstance(value, dict):
+        return any(is_unresolved(v) for v in value.values())
+    elif isinstance(value, list):
+        return any(is_unresolved(v) for v in value)
+    return False
+
+def canonical_json(value):
+    """Policy documents as key-sorted JSON, whether given as a dict or a JSON string."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+def diff_fields(desired, existing, prefix="", keys=None):
+    """Field-level diff of the observable fields, as {"a.b": {"before": ..., "after": ...}}.
+
+    Only fields that are both desired and observed are compared unless keys is given.
+    """
+    if keys is None:
+        keys = [key for key in existing if key in desired]
+    changes = {}
+    for key in keys:
+        path = f"{prefix}{key}"
+        before, after = existing.get(key), desired.get(key)
+        if isinstance(before, dict) and isinstance(after, dict):
+            nested_keys = list(before) + [k for k in after if k not in before]
+            changes.update(diff_fields(after, before, f"{path}.", nested_keys))
+        elif is_unresolved(after):
+            changes[path] = {"before": before, "after": UNKNOWN}
+        elif before != after:
+            changes[path] = {"before": before, "after": after}
+    return changes
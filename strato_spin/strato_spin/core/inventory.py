@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+def paginate(client, operation, result_key, **kwargs):
+    """Yield every item under result_key across all pages of a list operation."""
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        yield from page.get(result_key, [])
+
+class Inventory:
+    """Lists each service once per client (account and region) and shares the index across resources."""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, max_workers)
+        self.indexes = {}
+
+    def prefetch(self, resources):
+        groups = {}
+        for resource in resources:
+            list_inventory = type(resource).list_inventory
+            if resource.client is None:
+                continue
+            groups.setdefault((list_inventory.__func__, resource.client), (list_inventory, []))[1].append(resource)
+        if not groups:
+            return
+
+        def fetch(key):
+            list_inventory, _ = groups[key]
+            try:
+                return list_inventory(key[1])
+            except Exception as e:
+                logger.warning(f"Inventory prefetch failed for {key[0].__qualname__}, falling back to per-resource probes: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(groups))) as executor:
+            for key, index in zip(groups, executor.map(fetch, groups)):
+                self.indexes[key] = index
+                for resource in groups[key][1]:
+                    resource.inventory = index
+                if index is not None:
+                    logger.debug(f"Prefetched {len(index)} items for {key[0].__qualname__}")
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+def journal_path(state_path):
+    state_path = Path(state_path)
+    return state_path.with_name(state_path.name.replace(".state.json", "") + ".journal.jsonl")
+
+class Journal:
+    """Append-only JSON-lines checkpoint of a deploy run, so an interrupted run can be resumed.
+
+    Each completed resource is flushed with its fingerprint and outputs as soon as it finishes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def start(self, names, resume=False):
+        """Begin a run; a resumed run appends to the interrupted run's journal instead of replacing it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        event = "resume" if resume else "start"
+        self._append({"event": event, "resources": sorted(names)}, mode="a" if resume else "w")
+
+    def completed(self, name, spec_hash, outputs):
+        self._append({"event": "completed", "name": name, "spec_hash": spec_hash, "outputs": outputs})
+
+    def failed(self, name, error):
+        self._append({"event": "failed", "name": name, "error": str(error)})
+
+    def finish(self, succeeded):
+        self._append({"event": "finish", "succeeded": succeeded})
+
+    def _append(self, entry, mode="a"):
+        entry["at"] = datetime.now(timezone.utc).isoformat()
+        line = json.dumps(entry, sort_keys=True, default=str)
+        with self._lock:
+            with open(self.path, mode) as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        """The last run as {"resources", "completed", "failed", "finished", "succeeded"}, or None."""
+        if not self.path.exists():
+            return None
+        checkpoint = None
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can leave a partial last line
+                    logger.warning(f"Ignoring truncated journal entry in {self.path}")
+                    continue
+                event = entry["event"]
+                if event == "start":
+                    checkpoint = {
+                        "resources": entry["resources"], "completed": {}, "failed": {},
+                        "finished": False, "succeeded": False
+                    }
+                elif checkpoint is None:
+                    continue
+                elif event == "resume":
+                    checkpoint["finished"] = False
+                    checkpoint["failed"] = {}
+                elif event == "completed":
+                    checkpoint["completed"][entry["name"]] = {
+                        "spec_hash": entry["spec_hash"], "outputs": entry["outputs"]
+                    }
+                    checkpoint["failed"].pop(entry["name"], None)
+                elif event == "failed":
+                    checkpoint["failed"][entry["name"]] = entry["error"]
+                elif event == "finish":
+                    checkpoint["finished"] = True
+                    checkpoint["succeeded"] = entry["succeeded"]
+        return checkpoint
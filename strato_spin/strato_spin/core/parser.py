@@ -1,22 +1,145 @@
 import yaml
 import re
 from collections import defaultdict
+from pathlib import Path
+from .state import user_cache_dir
+from .. import __version__
+import hashlib
+import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# libyaml's loader is several times faster when PyYAML was built with it
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+REFERENCE_PATTERN = re.compile(r"\${([^}]+)}")
+
+# Bump when the parsed model or extract_dependencies changes, so cached models are not reused
+INFRA_CACHE_FORMAT = 2
+
+def _walk(value, path):
+    for part in path:
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+class Template:
+    """A property tree compiled once into literal parts and ${...} slots."""
+
+    def __init__(self, value):
+        self.root = self._compile(value)
+
+    def _compile(self, value):
+        if isinstance(value, str):
+            parts = []
+            position = 0
+            for match in REFERENCE_PATTERN.finditer(value):
+                if match.start() > position:
+                    parts.append(value[position:match.start()])
+                parts.append((match.group(0), tuple(match.group(1).split("."))))
+                position = match.end()
+            if not any(isinstance(part, tuple) for part in parts):
+                return ("literal", value)
+            if position < len(value):
+                parts.append(value[position:])
+            return ("string", parts)
+        elif isinstance(value, dict):
+            return ("dict", [(k, self._compile(v)) for k, v in value.items()])
+        elif isinstance(value, list):
+            return ("list", [self._compile(item) for item in value])
+        return ("literal", value)
+
+    def render(self, lookup):
+        return self._render(self.root, lookup)
+
+    def _render(self, node, lookup):
+        kind, body = node
+        if kind == "string":
+            rendered = []
+            for part in body:
+                if isinstance(part, tuple):
+                    value = lookup(part[1])
+                    rendered.append(part[0] if value is None or value == {} else str(value))
+                else:
+                    rendered.append(part)
+            return "".join(rendered)
+        elif kind == "dict":
+            return {k: self._render(v, lookup) for k, v in body}
+        elif kind == "list":
+            return [self._render(item, lookup) for item in body]
+        return body
+
 class Parser:
-    def __init__(self, infra_file, plugin_registry, flavour=None):
-        with open(infra_file, "r") as f:
-            self.infra = yaml.safe_load(f)
-        self.variables = self.infra.get("variables", {})
-        self.flavour = flavour or self.infra.get("flavour", "prod")
-        self.variables["flavour"] = self.flavour
+    def __init__(self, infra_file, plugin_registry, flavour=None, use_cache=True):
+        with open(infra_file, "rb") as f:
+            content = f.read()
+        cache_path = self._cache_path(infra_file, content) if use_cache else None
+        cached = self._read_cache(cache_path)
+        if cached:
+            self.infra, dependencies = cached
+        else:
+            self.infra = yaml.load(content, Loader=SafeLoader)
+            dependencies = None
         self.resources = self.infra.get("resources", [])
         self.dependencies = defaultdict(list)
         self.resource_map = {r["name"]: r for r in self.resources}
         self.plugin_registry = plugin_registry
-        self.extract_dependencies()
+        if dependencies is None:
+            self.extract_dependencies()
+            self._write_cache(cache_path, (self.infra, dict(self.dependencies)))
+        else:
+            self.dependencies.update(dependencies)
+        self.variables = self.infra.setdefault("variables", {})
+        self.flavour = flavour or self.infra.get("flavour", "prod")
+        self.variables["flavour"] = self.flavour
+        self.compile_resources()
+
+    def _cache_path(self, infra_file, content):
+        """Cache file for this infra file's content; one entry per infra path is kept."""
+        path_key = hashlib.sha256(str(Path(infra_file).resolve()).encode("utf-8")).hexdigest()[:16]
+        header = f"{__version__}\0{INFRA_CACHE_FORMAT}\0".encode("utf-8")
+        content_key = hashlib.sha256(header + content).hexdigest()
+        return user_cache_dir("infra", f"{path_key}-{content_key}.json")
+
+    def _read_cache(self, cache_path):
+        if cache_path is None or not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            return cached["infra"], cached["dependencies"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable infra cache {cache_path}: {e}")
+            return None
+
+    def _write_cache(self, cache_path, model):
+        # Written before flavour variables are applied, so one entry serves every flavour
+        if cache_path is None:
+            return
+        infra, dependencies = model
+        try:
+            serialized = json.dumps({"infra": infra, "dependencies": dependencies})
+        except (TypeError, ValueError):
+            serialized = None
+        # YAML dates, sets, binary values or non-string keys do not survive JSON, so those files are not cached
+        if serialized is None or json.loads(serialized)["infra"] != infra:
+            logger.debug(f"Not caching {cache_path.name}: the infra file has values JSON cannot hold")
+            return
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            path_key = cache_path.name.split("-")[0]
+            for suffix in ("json", "pickle"):
+                for stale in cache_path.parent.glob(f"{path_key}-*.{suffix}"):
+                    stale.unlink()
+            temp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_path, "w") as f:
+                f.write(serialized)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write infra cache {cache_path}: {e}")
 
     def extract_dependencies(self):
         def find_dependencies(value, dependencies):
@@ -77,48 +200,45 @@ class Parser:
             if node not in visited:
                 dfs(node)
 
-        return [self.resource_map[name] for name in reversed(stack)]
-
-    def resolve_variables(self, resource_outputs, self_outputs=None):
-        def replace_match(match, resource_name):
-            path = match.group(1).split(".")
-            if path[0] == "variables":
-                value = self.variables
-                for part in path[1:]:
-                    value = value.get(part, {})
-                return str(value) if value else match.group(0)
-            elif path[0] == "resources":
-                resource = path[1]
-                prop = ".".join(path[3:])
-                if resource in resource_outputs:
-                    value = resource_outputs[resource]
-                    for part in path[2:]:
-                        value = value.get(part, {})
-                    return str(value) if value else match.group(0)
-            elif path[0] == "self" and self_outputs:
-                value = self_outputs
-                for part in path[1:]:
-                    value = value.get(part, {})
-                return str(value) if value else match.group(0)
-            return match.group(0)
-
-        def recursive_replace(obj, resource_name):
-            if isinstance(obj, str):
-                return re.sub(r"\${([^}]+)}", lambda m: replace_match(m, resource_name), obj)
-            elif isinstance(obj, dict):
-                return {k: recursive_replace(v, resource_name) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [recursive_replace(item, resource_name) for item in obj]
-            return obj
+        # Post-order over dependencies already puts every dependency before its dependents
+        return [self.resource_map[name] for name in stack]
 
+    def compile_resources(self):
+        """Apply flavour overrides and name suffixes once, then compile each resource into templates."""
+        self.templates = {}
         for resource in self.resources:
-            flavour_props = resource.get("flavours", {}).get(self.flavour, {})
-            resource["properties"] = {**resource["properties"], **flavour_props}
+            properties = dict(resource["properties"])
+            # Overrides may sit under the resource or under its properties; the resource-level ones win
+            flavour_props = {
+                **properties.pop("flavours", {}).get(self.flavour, {}),
+                **resource.get("flavours", {}).get(self.flavour, {})
+            }
+            properties.update(flavour_props)
             name_field = self._get_name_field(resource.get("platform", "aws"), resource["type"])
-            if name_field and name_field in resource["properties"]:
-                resource["properties"][name_field] = f"{resource['properties'][name_field]}-{self.flavour}"
-            resource["properties"] = recursive_replace(resource["properties"], resource["name"])
-            resource["tags"] = recursive_replace(resource["tags"], resource["name"])
+            if name_field and name_field in properties:
+                properties[name_field] = f"{properties[name_field]}-{self.flavour}"
+            self.templates[resource["name"]] = (Template(properties), Template(resource["tags"]))
+
+    def resolve_resource(self, name, resource_outputs=None, self_outputs=None):
+        """Resolve one resource's properties and tags against a snapshot of upstream outputs.
+
+        Returns fresh (properties, tags) dicts; unresolvable references are left as ${...}.
+        """
+        resource_outputs = resource_outputs or {}
+
+        def lookup(path):
+            if path[0] == "resources" and len(path) > 2:
+                return _walk(resource_outputs.get(path[1]), path[2:])
+            elif path[0] == "self":
+                return _walk(self_outputs, path[1:])
+            elif path[0] == "variables":
+                return _walk(self.variables, path[1:])
+            elif len(path) == 1:
+                return _walk(self.variables, path)
+            return None
+
+        properties_template, tags_template = self.templates[name]
+        return properties_template.render(lookup), tags_template.render(lookup)
 
     def _get_name_field(self, platform, resource_type):
         name_fields = {
@@ -1,11 +1,19 @@
-from importlib import import_module
+from importlib import import_module, metadata
+from importlib.util import module_from_spec, spec_from_file_location, spec_from_loader
 from pathlib import Path
 from .base_resource import BaseResource
+from .state import hash_spec, user_cache_dir
+from .. import __version__
+import json
 import logging
+import os
 import sys
 
 logger = logging.getLogger(__name__)
 
+ENTRY_POINT_GROUP = "strato_spin.plugins"
+EXTENSIONS_PACKAGE = "extensions"
+
 def find_mro_index(child_class, base_class):
     mro = child_class.__mro__
     for i, cls in enumerate(mro):
@@ -13,61 +21,190 @@ def find_mro_index(child_class, base_class):
             return i
     return -1
 
+# Core plugins as "module:Class"; a module is imported only when an infra file uses its type
+CORE_PLUGINS = {
+    "aws": {
+        "lambda_function": "strato_spin.resources.aws.lambda_func.lambda_func:LambdaFunction",
+        "s3_bucket": "strato_spin.resources.aws.s3_bucket.s3_bucket:S3Bucket",
+        "sqs_queue": "strato_spin.resources.aws.sqs_queue.sqs_queue:SQSQueue",
+        "dynamodb_table": "strato_spin.resources.aws.dynamodb_table.dynamodb_table:DynamoDBTable",
+        "kms_key": "strato_spin.resources.aws.kms_key.kms_key:KMSKey",
+        "iam_role": "strato_spin.resources.aws.iam_role.iam_role:IAMRole",
+        "s3_upload": "strato_spin.resources.aws.s3_upload.s3_upload:S3Upload",
+        "eventbridge_rule": "strato_spin.resources.aws.eventbridge_rule.eventbridge_rule:EventBridgeRule"
+    },
+    "azure": {
+        "function_app": "strato_spin.resources.azure.function_app.function_app:FunctionApp"
+    },
+    "gcp": {
+        "cloud_run": "strato_spin.resources.gcp.cloud_run.cloud_run:CloudRun"
+    }
+}
+
+def _file_listing(directory, pattern):
+    return [
+        (str(path), path.stat().st_mtime_ns, path.stat().st_size)
+        for path in sorted(Path(directory).glob(pattern))
+    ]
+
+def _extensions_package(directory):
+    """Register the extensions directory as the "extensions" package, so extensions can import siblings."""
+    directory = str(directory)
+    package = sys.modules.get(EXTENSIONS_PACKAGE)
+    if package is None:
+        init_file = Path(directory) / "__init__.py"
+        if init_file.exists():
+            spec = spec_from_file_location(EXTENSIONS_PACKAGE, init_file, submodule_search_locations=[directory])
+        else:
+            spec = spec_from_loader(EXTENSIONS_PACKAGE, None, is_package=True)
+            spec.submodule_search_locations = [directory]
+        package = module_from_spec(spec)
+        sys.modules[EXTENSIONS_PACKAGE] = package
+        if spec.loader:
+            try:
+                spec.loader.exec_module(package)
+            except BaseException:
+                del sys.modules[EXTENSIONS_PACKAGE]
+                raise
+    elif directory not in package.__path__:
+        package.__path__.insert(0, directory)
+    return package
+
+def _load_extension_module(path):
+    """Import an extension file as extensions.<stem>, without putting its directory on sys.path."""
+    path = Path(path)
+    _extensions_package(path.parent)
+    return import_module(f"{EXTENSIONS_PACKAGE}.{path.stem}")
+
 class PluginRegistry:
-    def __init__(self, extensions_path=None):
+    """Maps (platform, resource_type) to plugin classes through a cached manifest.
+
+    The manifest records each plugin's "module:Class" path, extension file and schema. It is
+    built once from the core plugins, the strato_spin.plugins entry points and the extensions
+    directory, and reused until the package version or any of those sources change. A manifest
+    built while some plugin failed to import is not cached, so installing a missing SDK takes effect.
+    """
+
+    def __init__(self, extensions_path=None, cache_dir=None):
         self.resource_types = {}
         self.schemas = {}
+        # Manifest entries for plugins that are registered but not imported yet
+        self.plugin_paths = {}
         self.extensions_path = extensions_path
+        self.cache_dir = Path(cache_dir) if cache_dir else user_cache_dir("plugins")
 
-    def register_plugins(self, plugin_path="strato_spin.resources"):
-        # Register core plugins
+    def _entry_points(self):
+        return sorted(
+            (entry_point.name, entry_point.value)
+            for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP)
+        )
+
+    def _manifest_key(self, entry_points):
         resources_dir = Path(__file__).parent.parent / "resources"
-        for platform_dir in resources_dir.iterdir():
-            if platform_dir.is_dir() and (platform_dir / "__init__.py").exists():
-                platform = platform_dir.name
-                self.resource_types[platform] = {}
-                self.schemas[platform] = {}
-                for resource_dir in platform_dir.iterdir():
-                    if resource_dir.is_dir() and (resource_dir / "__init__.py").exists():
-                        module_name = resource_dir.name
-                        try:
-                            module = import_module(f"{plugin_path}.{platform}.{module_name}.{module_name}")
-                            for attr_name in dir(module):
-                                attr = getattr(module, attr_name)
-                                if isinstance(attr, type) and issubclass(attr, BaseResource) and attr != BaseResource:
-                                    resource_type = attr.resource_type
-                                    self.resource_types[platform][resource_type] = attr
-                                    self.schemas[platform][resource_type] = attr.get_schema()
-                                    logger.info(f"Registered core plugin: {platform}/{resource_type}")
-                        except ImportError as e:
-                            logger.error(f"Failed to load core plugin {platform}/{module_name}: {e}")
-
-        # Register extension plugins
+        extensions = []
+        if self.extensions_path and Path(self.extensions_path).exists():
+            extensions = _file_listing(Path(self.extensions_path).resolve(), "*.py")
+        return hash_spec(__version__, _file_listing(resources_dir, "*/*/*.py"), entry_points, extensions)
+
+    def _build_manifest(self, entry_points):
+        """Return (plugins, complete); complete is False when any plugin failed to import."""
+        plugins = {}
+        failures = []
+
+        def add(resource_class, path, source, file=None):
+            plugins.setdefault(resource_class.platform, {})[resource_class.resource_type] = {
+                "path": path,
+                "file": file,
+                "source": source,
+                "schema": resource_class.get_schema()
+            }
+
+        for platform, types in CORE_PLUGINS.items():
+            for resource_type, path in types.items():
+                try:
+                    add(self._import(path), path, "core")
+                except (ImportError, AttributeError) as e:
+                    logger.error(f"Failed to load core plugin {platform}/{resource_type}: {e}")
+                    failures.append(path)
+
+        for name, path in entry_points:
+            try:
+                add(self._import(path), path, "entry_point")
+            except (ImportError, AttributeError) as e:
+                logger.error(f"Failed to load entry point plugin {name}: {e}")
+                failures.append(path)
+
         if self.extensions_path:
-            extensions_dir = Path(self.extensions_path)
-            if extensions_dir.exists():
-                sys.path.append(str(extensions_dir.parent))
-                for ext_file in extensions_dir.glob("*.py"):
-                    if ext_file.name != "__init__.py":
-                        module_name = ext_file.stem
-                        try:
-                            module = import_module(f"extensions.{module_name}")
-                            for attr_name in dir(module):
-                                attr = getattr(module, attr_name)
-                                if isinstance(attr, type) and issubclass(attr, BaseResource) and find_mro_index(attr, BaseResource)>1:
-                                    resource_type = attr.resource_type
-                                    platform = attr.platform
-                                    if platform not in self.resource_types:
-                                        self.resource_types[platform] = {}
-                                        self.schemas[platform] = {}
-                                    self.resource_types[platform][resource_type] = attr
-                                    self.schemas[platform][resource_type] = attr.get_schema()
-                                    logger.info(f"Registered extension plugin: {platform}/{resource_type}")
-                        except ImportError as e:
-                            logger.error(f"Failed to load extension plugin {module_name}: {e}")
-                sys.path.pop()
+            extensions_dir = Path(self.extensions_path).resolve()
+            for ext_file in sorted(extensions_dir.glob("*.py")):
+                if ext_file.name == "__init__.py":
+                    continue
+                try:
+                    module = _load_extension_module(ext_file)
+                except ImportError as e:
+                    logger.error(f"Failed to load extension plugin {ext_file.stem}: {e}")
+                    failures.append(str(ext_file))
+                    continue
+                for attr_name in dir(module):
+                    attr = getattr(module, attr_name)
+                    if isinstance(attr, type) and issubclass(attr, BaseResource) and find_mro_index(attr, BaseResource) > 1:
+                        add(attr, f"{module.__name__}:{attr_name}", "extension", str(ext_file))
+        return plugins, not failures
+
+    def _load_manifest(self):
+        entry_points = self._entry_points()
+        key = self._manifest_key(entry_points)
+        manifest_path = self.cache_dir / f"manifest-{key[:16]}.json"
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest["key"] == key:
+                return manifest["plugins"]
+        except (OSError, ValueError, KeyError):
+            pass
+        plugins, complete = self._build_manifest(entry_points)
+        if not complete:
+            # A failed import may be a missing optional SDK; caching would hide the plugin once it is installed
+            return plugins
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_path, "w") as f:
+                json.dump({"key": key, "plugins": plugins}, f, indent=2, default=str)
+            os.replace(temp_path, manifest_path)
+        except OSError as e:
+            logger.warning(f"Could not write plugin manifest {manifest_path}: {e}")
+        return plugins
+
+    def register_plugins(self):
+        for platform, plugins in self._load_manifest().items():
+            self.resource_types.setdefault(platform, {})
+            self.schemas.setdefault(platform, {})
+            for resource_type, entry in plugins.items():
+                self.plugin_paths.setdefault(platform, {})[resource_type] = entry
+                self.schemas[platform][resource_type] = entry["schema"]
+                logger.debug(f"Registered {entry['source']} plugin: {platform}/{resource_type}")
+
+    def _import(self, path, file=None):
+        module_name, class_name = path.split(":")
+        module = _load_extension_module(file) if file else import_module(module_name)
+        return getattr(module, class_name)
+
+    def _load(self, platform, resource_type):
+        entry = self.plugin_paths.get(platform, {}).pop(resource_type, None)
+        if entry is None:
+            return
+        try:
+            resource_class = self._import(entry["path"], entry.get("file"))
+        except (ImportError, AttributeError) as e:
+            logger.error(f"Failed to load plugin {platform}/{resource_type}: {e}")
+            return
+        self.resource_types[platform][resource_type] = resource_class
+        logger.debug(f"Loaded plugin {platform}/{resource_type} from {entry['path']}")
 
     def get_resource_class(self, platform, resource_type):
+        if resource_type not in self.resource_types.get(platform, {}):
+            self._load(platform, resource_type)
         return self.resource_types.get(platform, {}).get(resource_type)
 
     def get_schema(self, platform, resource_type):
@@ -0,0 +1,106 @@
+from .tracing import is_throttle
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Starting request rates per second for control-plane APIs that throttle early
+DEFAULT_SERVICE_RATES = {
+    "iam": 10,
+    "kms": 20,
+    "lambda": 15,
+    "sts": 10,
+    "events": 15
+}
+DEFAULT_RATE = 25
+
+class TokenBucket:
+    """Token bucket whose rate backs off on throttles and recovers on success (AIMD)."""
+
+    def __init__(self, rate, burst=None, min_rate=0.5, max_rate=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.min_rate = min_rate
+        self.max_rate = float(max_rate or rate * 4)
+        self.tokens = self.capacity
+        self.calls = 0
+        self.throttles = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.calls += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+class RateLimiter:
+    """Shares one token bucket per (service, region, account) across all pooled clients."""
+
+    def __init__(self, service_rates=None, default_rate=DEFAULT_RATE):
+        self.service_rates = {**DEFAULT_SERVICE_RATES, **(service_rates or {})}
+        self.default_rate = default_rate
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, service_rates):
+        with self._lock:
+            self.service_rates.update(service_rates or {})
+
+    def bucket(self, service, region, account_id):
+        key = (service, region, account_id)
+        with self._lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.service_rates.get(service, self.default_rate))
+            return self.buckets[key]
+
+    def instrument_client(self, client):
+        bucket = self.bucket(
+            client.meta.service_model.service_name,
+            client.meta.region_name,
+            getattr(client.meta, "account_id", None)
+        )
+
+        def before_send(**kwargs):
+            # Fires once per HTTP attempt, so botocore retries are paced too
+            bucket.acquire()
+
+        def needs_retry(response=None, **kwargs):
+            if is_throttle(response):
+                bucket.on_throttle()
+            elif response is not None:
+                bucket.on_success()
+
+        client.meta.events.register("before-send.*.*", before_send)
+        client.meta.events.register("needs-retry.*.*", needs_retry)
+
+    def report(self):
+        """Throttle counts per service, summed over regions and accounts."""
+        throttles = {}
+        with self._lock:
+            for (service, _, _), bucket in self.buckets.items():
+                throttles[service] = throttles.get(service, 0) + bucket.throttles
+        return throttles
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,177 @@
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Returned by a task that must wait: the node holds no worker or lane until future completes,
+# then resume(future) runs on a worker under the node's lanes as its next step. resume gets
+# the future, failed or not, so it can report a failed wait; it may return another Deferred.
+Deferred = namedtuple("Deferred", ["future", "resume"])
+
+class DagScheduler:
+    """Runs a task per node as soon as all of the node's dependencies have succeeded.
+
+    Nodes may also belong to lanes (e.g. a platform or resource type) with their own
+    limits, so a saturated lane holds back only its own nodes. A task may return a
+    Deferred to wait for the cloud without occupying a worker.
+    """
+
+    def __init__(self, dependencies, max_workers=4, fail_fast=True, lanes=None, lane_limits=None):
+        self.dependencies = dependencies
+        self.max_workers = max(1, max_workers)
+        self.fail_fast = fail_fast
+        self.lanes = lanes or {}
+        self.lane_limits = {lane: max(1, limit) for lane, limit in (lane_limits or {}).items()}
+
+    def _lanes_free(self, node, lane_usage):
+        return all(
+            lane_usage[lane] < self.lane_limits[lane]
+            for lane in self.lanes.get(node, []) if lane in self.lane_limits
+        )
+
+    def run(self, nodes, task):
+        """Returns {node: True|False|None} for succeeded, failed and skipped nodes."""
+        nodes = list(nodes)
+        node_set = set(nodes)
+        in_degree = {}
+        dependents = defaultdict(list)
+        for node in nodes:
+            deps = {dep for dep in self.dependencies.get(node, []) if dep in node_set}
+            in_degree[node] = len(deps)
+            for dep in deps:
+                dependents[dep].append(node)
+
+        ready = deque(node for node in nodes if in_degree[node] == 0)
+        resumes = deque()
+        running = {}
+        deferred = {}
+        results = {}
+        lane_usage = defaultdict(int)
+        aborted = False
+
+        def settle(node, succeeded):
+            nonlocal aborted
+            results[node] = succeeded
+            if succeeded:
+                for dependent in dependents[node]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        ready.append(dependent)
+            elif self.fail_fast and not aborted:
+                logger.error(f"Deployment failed for {node}, aborting")
+                aborted = True
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while ready or resumes or running or deferred:
+                # Nodes that already started finish their remaining steps even after an abort
+                held = deque()
+                while resumes and len(running) < self.max_workers:
+                    node, resume, waited = resumes.popleft()
+                    if not self._lanes_free(node, lane_usage):
+                        held.append((node, resume, waited))
+                        continue
+                    lanes = self.lanes.get(node, [])
+                    for lane in lanes:
+                        lane_usage[lane] += 1
+                    running[executor.submit(resume, waited)] = (node, lanes)
+                resumes.extendleft(reversed(held))
+                waiting = deque()
+                while ready and not aborted and len(running) < self.max_workers:
+                    node = ready.popleft()
+                    if not self._lanes_free(node, lane_usage):
+                        waiting.append(node)
+                        continue
+                    lanes = self.lanes.get(node, [])
+                    for lane in lanes:
+                        lane_usage[lane] += 1
+                    running[executor.submit(task, node)] = (node, lanes)
+                ready.extendleft(reversed(waiting))
+                if not running and not deferred:
+                    break
+                done, _ = wait([*running, *deferred], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in deferred:
+                        node, resume = deferred.pop(future)
+                        resumes.append((node, resume, future))
+                        continue
+                    node, lanes = running.pop(future)
+                    for lane in lanes:
+                        lane_usage[lane] -= 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Task for {node} raised: {e}")
+                        result = False
+                    if isinstance(result, Deferred):
+                        # The node waits on its future without holding a worker or lane slot
+                        deferred[result.future] = (node, result.resume)
+                    else:
+                        settle(node, bool(result))
+
+        for node in nodes:
+            if node not in results:
+                logger.warning(f"Skipped {node} after an earlier failure")
+                results[node] = None
+        return results
+
+class AsyncDagScheduler:
+    """Runs a coroutine per node once its dependencies have succeeded, with the same lanes as DagScheduler.
+
+    Waiting nodes cost a coroutine rather than a thread, so max_in_flight can be far larger
+    than the executor that runs the blocking calls.
+    """
+
+    def __init__(self, dependencies, max_in_flight=256, fail_fast=True, lanes=None, lane_limits=None):
+        self.dependencies = dependencies
+        self.max_in_flight = max(1, max_in_flight)
+        self.fail_fast = fail_fast
+        self.lanes = lanes or {}
+        self.lane_limits = {lane: max(1, limit) for lane, limit in (lane_limits or {}).items()}
+
+    async def run(self, nodes, task):
+        """Returns {node: True|False|None} for succeeded, failed and skipped nodes."""
+        nodes = list(nodes)
+        loop = asyncio.get_running_loop()
+        finished = {node: loop.create_future() for node in nodes}
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        lane_semaphores = {lane: asyncio.Semaphore(limit) for lane, limit in self.lane_limits.items()}
+        aborted = False
+
+        async def run_node(node):
+            nonlocal aborted
+            deps = [finished[dep] for dep in self.dependencies.get(node, []) if dep in finished]
+            if not all([await dep for dep in deps]):
+                return None
+            # Lanes are taken in a fixed order before the global slot, so waiting on a lane holds nothing else
+            semaphores = [lane_semaphores[lane] for lane in sorted(self.lanes.get(node, [])) if lane in lane_semaphores]
+            semaphores.append(in_flight)
+            for semaphore in semaphores:
+                await semaphore.acquire()
+            try:
+                if aborted:
+                    return None
+                try:
+                    succeeded = bool(await task(node))
+                except Exception as e:
+                    logger.error(f"Task for {node} raised: {e}")
+                    succeeded = False
+                if not succeeded and self.fail_fast and not aborted:
+                    logger.error(f"Deployment failed for {node}, aborting")
+                    aborted = True
+                return succeeded
+            finally:
+                for semaphore in semaphores:
+                    semaphore.release()
+
+        async def settle(node):
+            result = await run_node(node)
+            finished[node].set_result(result)
+            return result
+
+        results = dict(zip(nodes, await asyncio.gather(*(settle(node) for node in nodes))))
+        for node, result in results.items():
+            if result is None:
+                logger.warning(f"Skipped {node} after an earlier failure")
+        return results
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = ".strato-spin"
+# Seconds between state file writes during a deploy; the journal covers crashes in between
+STATE_FLUSH_INTERVAL = 5.0
+
+def user_cache_dir(*parts):
+    """Per-user cache shared across projects: $STRATO_SPIN_CACHE_DIR, else $XDG_CACHE_HOME/strato-spin."""
+    base = os.environ.get("STRATO_SPIN_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "strato-spin"
+    )
+    return Path(base, *parts)
+
+def default_state_path(infra_file, flavour, state_dir=None):
+    infra_path = Path(infra_file)
+    base_dir = Path(state_dir) if state_dir else infra_path.resolve().parent / STATE_DIR
+    return base_dir / f"{infra_path.stem}.{flavour}.state.json"
+
+def hash_spec(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def hash_tree(path):
+    """Content hash of a file or directory tree, independent of timestamps; None if it is missing."""
+    path = Path(path)
+    if path.is_file():
+        files = [(path.name, path)]
+    elif path.is_dir():
+        files = sorted(
+            (file.relative_to(path).as_posix(), file)
+            for file in path.rglob("*")
+            if file.is_file() and "__pycache__" not in file.parts and file.suffix != ".pyc"
+        )
+    else:
+        return None
+    digest = hashlib.sha256()
+    for relative_path, file in files:
+        digest.update(relative_path.encode("utf-8") + b"\0")
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def age_seconds(recorded):
+    updated_at = recorded.get("updated_at")
+    if not updated_at:
+        return None
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(updated_at)).total_seconds()
+
+class StateStore:
+    """JSON file recording the last applied spec hash, observed properties and outputs per resource.
+
+    Changes are written at most every STATE_FLUSH_INTERVAL seconds; call flush() when a deploy ends.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.resources = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    self.resources = json.load(f).get("resources", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable state file {self.path}: {e}")
+
+    def get(self, name):
+        with self._lock:
+            return self.resources.get(name)
+
+    def record(self, name, spec_hash, properties, outputs):
+        with self._lock:
+            self.resources[name] = {
+                "spec_hash": spec_hash,
+                "properties": properties,
+                "outputs": outputs,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
+            self._changed()
+
+    def forget(self, name):
+        with self._lock:
+            if self.resources.pop(name, None) is not None:
+                self._changed()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _changed(self):
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= STATE_FLUSH_INTERVAL:
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump({"resources": self.resources}, f, indent=2, sort_keys=True, default=str)
+        os.replace(temp_path, self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
@@ -0,0 +1,157 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "TooManyRequestsException", "RequestLimitExceeded", "ProvisionedThroughputExceededException",
+    "SlowDown", "RequestThrottled", "PriorRequestNotComplete"
+}
+
+def is_throttle(response):
+    if not response:
+        return False
+    return response[1].get("Error", {}).get("Code") in THROTTLE_CODES
+
+class Tracer:
+    """Collects timing spans and AWS API calls, exported as a Chrome trace-event file."""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._wall_origin = time.time()
+
+    def enable(self):
+        self.enabled = True
+        self.events = []
+        self._origin = time.perf_counter()
+        self._wall_origin = time.time()
+
+    def export(self):
+        """(wall-clock origin, events), for a tracer in another process to merge."""
+        with self._lock:
+            return self._wall_origin, list(self.events)
+
+    def merge(self, exported):
+        """Add events exported by a tracer in another process, such as a build worker, to this timeline."""
+        if not self.enabled or not exported:
+            return
+        wall_origin, events = exported
+        shift = round((wall_origin - self._wall_origin) * 1e6)
+        with self._lock:
+            self.events.extend({**event, "ts": event["ts"] + shift} for event in events)
+
+    def _record(self, name, category, start, end, args):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6),
+            "dur": round((end - start) * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args
+        }
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name, category="deploy", **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, category, start, time.perf_counter(), args)
+
+    def instrument_client(self, client):
+        events = client.meta.events
+        events.register("before-call.*.*", self._before_call)
+        events.register("after-call.*.*", self._after_call)
+        events.register("after-call-error.*.*", self._after_call_error)
+        # Observes only and returns None, so botocore's retry handler still makes the decision
+        events.register("needs-retry.*.*", self._needs_retry)
+
+    def _before_call(self, model, context, **kwargs):
+        if self.enabled:
+            context["trace_start"] = time.perf_counter()
+            context["trace_model"] = model
+
+    def _after_call(self, model, parsed, context, **kwargs):
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        self._finish_call(model, context, retries, parsed.get("Error", {}).get("Code"))
+
+    def _after_call_error(self, context, exception, **kwargs):
+        model = context.get("trace_model")
+        if model is not None:
+            self._finish_call(model, context, context.get("trace_retries", 0), type(exception).__name__)
+
+    def _needs_retry(self, request_dict=None, response=None, attempts=None, operation=None, **kwargs):
+        if not self.enabled or request_dict is None:
+            return None
+        context = request_dict.get("context", {})
+        context["trace_retries"] = attempts - 1 if attempts else 0
+        if is_throttle(response):
+            context["trace_throttles"] = context.get("trace_throttles", 0) + 1
+        return None
+
+    def _finish_call(self, model, context, retries, error):
+        start = context.pop("trace_start", None)
+        if not self.enabled or start is None:
+            return
+        self._record(
+            f"{model.service_model.service_name}.{model.name}",
+            "aws",
+            start,
+            time.perf_counter(),
+            {"retries": retries, "throttles": context.get("trace_throttles", 0), "error": error}
+        )
+
+    def write_chrome_trace(self, path):
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, limit=10):
+        """Text table of the slowest resources and AWS operations."""
+        with self._lock:
+            events = list(self.events)
+        resources = sorted(
+            (e for e in events if e["cat"] == "resource"), key=lambda e: e["dur"], reverse=True
+        )[:limit]
+        operations = defaultdict(lambda: {"calls": 0, "total": 0, "max": 0, "retries": 0, "throttles": 0})
+        for event in events:
+            if event["cat"] != "aws":
+                continue
+            stats = operations[event["name"]]
+            stats["calls"] += 1
+            stats["total"] += event["dur"]
+            stats["max"] = max(stats["max"], event["dur"])
+            stats["retries"] += event["args"]["retries"]
+            stats["throttles"] += event["args"]["throttles"]
+
+        lines = ["Slowest resources:"]
+        for event in resources:
+            lines.append(f"  {event['dur'] / 1000:10.1f} ms  {event['name']}")
+        lines.append("Slowest AWS operations:")
+        lines.append(f"  {'total ms':>10}  {'calls':>5}  {'max ms':>8}  {'retries':>7}  {'throttles':>9}  operation")
+        slowest = sorted(operations.items(), key=lambda item: item[1]["total"], reverse=True)[:limit]
+        for name, stats in slowest:
+            lines.append(
+                f"  {stats['total'] / 1000:10.1f}  {stats['calls']:5d}  {stats['max'] / 1000:8.1f}  "
+                f"{stats['retries']:7d}  {stats['throttles']:9d}  {name}"
+            )
+        return "\n".join(lines)
+
+tracer = Tracer()
@@ -0,0 +1,121 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Pending:
+    """A condition a resource waits on after create/update, e.g. a table becoming ACTIVE.
+
+    describe() makes one read call and predicate(result) says whether the cloud has settled;
+    the predicate may raise to fail the wait. Once it holds, the deployer runs then() as the
+    resource's next step, on a deploy worker, and it may return another Pending. Plugins
+    return a Pending instead of blocking, and the Poller checks it without holding a worker.
+    """
+
+    def __init__(self, description, describe, predicate=bool, then=None, interval=2, max_interval=30,
+                 timeout=600):
+        self.description = description
+        self.describe = describe
+        self.predicate = predicate
+        self.then = then
+        self.interval = interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+
+    def check(self):
+        return self.predicate(self.describe())
+
+class Poller:
+    """Checks every outstanding Pending from one scheduling thread.
+
+    Checks that fall due together are dispatched as a batch to a small pool, and each
+    condition backs off from its interval towards max_interval while it is not met.
+    submit() returns a Future that resolves once the condition holds; the Poller only reads,
+    so follow-up steps stay within the deploy's worker and lane limits.
+    """
+
+    def __init__(self, max_workers=4, backoff=1.5):
+        self.max_workers = max_workers
+        self.backoff = backoff
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._stopped = False
+
+    def submit(self, pending):
+        future = Future()
+        self._start()
+        self._schedule(time.monotonic(), pending, future, pending.interval, time.monotonic() + pending.timeout)
+        return future
+
+    def _start(self):
+        with self._condition:
+            if self._thread is None:
+                self._stopped = False
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                self._thread = threading.Thread(target=self._run, name="strato-spin-poller", daemon=True)
+                self._thread.start()
+
+    def _schedule(self, due, pending, future, interval, deadline):
+        with self._condition:
+            if self._stopped:
+                future.cancel()
+                return
+            heapq.heappush(self._queue, (due, next(self._sequence), pending, future, interval, deadline))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                # Taken under the lock, as stop() clears it once the loop is told to exit
+                executor = self._executor
+                now = time.monotonic()
+                batch = []
+                while self._queue and self._queue[0][0] <= now:
+                    batch.append(heapq.heappop(self._queue))
+            logger.debug(f"Polling {len(batch)} pending condition(s)")
+            for entry in batch:
+                try:
+                    executor.submit(self._check, *entry[2:])
+                except RuntimeError as e:
+                    # The pool is shutting down; fail the wait rather than leave its future unresolved
+                    entry[3].set_exception(e)
+
+    def _check(self, pending, future, interval, deadline):
+        try:
+            if pending.check():
+                future.set_result(True)
+                return
+            now = time.monotonic()
+            if now >= deadline:
+                raise TimeoutError(f"Timed out waiting for {pending.description}")
+            logger.debug(f"Waiting for {pending.description}")
+            self._schedule(now + interval, pending, future, min(pending.max_interval, interval * self.backoff), deadline)
+        except Exception as e:
+            future.set_exception(e)
+
+    def stop(self):
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopped = True
+            self._condition.notify()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        thread.join()
+        executor.shutdown(wait=True)
+        with self._condition:
+            for entry in self._queue:
+                entry[3].cancel()
+            self._queue = []
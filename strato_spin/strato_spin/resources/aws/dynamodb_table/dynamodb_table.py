@@ -1,4 +1,6 @@
 from ....core.base_resource import BaseResource
+from ....core.inventory import paginate
+from ....core.waiter import Pending
 import logging
 
 logger = logging.getLogger(__name__)
@@ -6,6 +8,7 @@ logger = logging.getLogger(__name__)
 class DynamoDBTable(BaseResource):
     resource_type = "dynamodb_table"
     platform = "aws"
+    managed_fields = ["billing_mode", "tags"]
 
     @classmethod
     def get_schema(cls):
@@ -20,12 +23,22 @@ class DynamoDBTable(BaseResource):
             }
         }
 
+    @classmethod
+    def list_inventory(cls, client):
+        return {table_name: None for table_name in paginate(client, "list_tables", "TableNames")}
+
     def exists(self):
-        try:
-            self.client.describe_table(TableName=self.properties["table_name"])
-            return True
-        except self.client.exceptions.ResourceNotFoundException:
-            return False
+        if self.inventory is not None:
+            return self.properties["table_name"] in self.inventory
+        return self._describe_table() is not None
+
+    def _describe_table(self):
+        def fetch():
+            try:
+                return self.client.describe_table(TableName=self.properties["table_name"])["Table"]
+            except self.client.exceptions.ResourceNotFoundException:
+                return None
+        return self.observe("describe_table", fetch)
 
     def create(self):
         attribute_definitions = [
@@ -43,34 +56,50 @@ class DynamoDBTable(BaseResource):
             BillingMode=self.properties.get("billing_mode", "PAY_PER_REQUEST"),
             Tags=[{"Key": k, "Value": v} for k, v in self.tags.items()]
         )
-        self.client.get_waiter("table_exists").wait(TableName=self.properties["table_name"])
-        self.outputs = self.get_outputs()
+        self.invalidate()
+        return self._until_active()
+
+    def _until_active(self):
+        def describe():
+            self.invalidate("describe_table")
+            return self._describe_table()
+        return Pending(
+            f"table {self.properties['table_name']} to become ACTIVE",
+            describe,
+            lambda table: table is not None and table["TableStatus"] == "ACTIVE",
+            interval=5
+        )
 
     def update(self, existing_properties):
-        if self.tags != existing_properties.get("tags", {}):
+        changed = self.changed_fields(existing_properties)
+        if "tags" in changed:
+            table_arn = self.get_outputs()["properties"]["arn"]
+            removed = [key for key in existing_properties.get("tags") or {} if key not in self.tags]
+            if removed:
+                self.client.untag_resource(ResourceArn=table_arn, TagKeys=removed)
             self.client.tag_resource(
-                ResourceArn=self.get_outputs()["properties"]["arn"],
+                ResourceArn=table_arn,
                 Tags=[{"Key": k, "Value": v} for k, v in self.tags.items()]
             )
-        if self.properties.get("billing_mode") != existing_properties.get("billing_mode"):
+        self.invalidate()
+        if "billing_mode" in changed:
             self.client.update_table(
                 TableName=self.properties["table_name"],
-                BillingMode=self.properties["billing_mode"]
+                BillingMode=self.desired_value("billing_mode")
             )
+            return self._until_active()
         self.outputs = self.get_outputs()
 
     def get_outputs(self):
-        response = self.client.describe_table(TableName=self.properties["table_name"])
         return {
             "properties": {
                 "table_name": self.properties["table_name"],
-                "arn": response["Table"]["TableArn"]
+                "arn": self._describe_table()["TableArn"]
             }
         }
 
     def get_existing_properties(self):
-        response = self.client.describe_table(TableName=self.properties["table_name"])
-        table = response["Table"]
+        table = self._describe_table()
         tags = self.client.list_tags_of_resource(ResourceArn=table["TableArn"]).get("Tags", {})
         return {
             "billing_mode": table.get("BillingModeSummary", {}).get("BillingMode", "PAY_PER_REQUEST"),
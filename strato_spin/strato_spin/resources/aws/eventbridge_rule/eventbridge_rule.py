@@ -1,4 +1,5 @@
 from ....core.base_resource import BaseResource
+from ....core.inventory import paginate
 import json
 import logging
 import botocore.exceptions
@@ -8,6 +9,7 @@ logger = logging.getLogger(__name__)
 class EventBridgeRule(BaseResource):
     resource_type = "eventbridge_rule"
     platform = "aws"
+    managed_fields = ["schedule_expression", "state", "description", "targets", "tags"]
 
     @classmethod
     def get_schema(cls):
@@ -23,13 +25,22 @@ class EventBridgeRule(BaseResource):
             }
         }
 
+    @classmethod
+    def list_inventory(cls, client):
+        return {rule["Name"]: rule for rule in paginate(client, "list_rules", "Rules")}
+
     def exists(self):
+        if self.inventory is not None:
+            return self.properties["rule_name"] in self.inventory
         try:
-            self.client.describe_rule(Name=self.properties["rule_name"])
+            self._describe_rule()
             return True
         except self.client.exceptions.ResourceNotFoundException:
             return False
 
+    def _describe_rule(self):
+        return self.observe("describe_rule", lambda: self.client.describe_rule(Name=self.properties["rule_name"]))
+
     def create(self):
         self.client.put_rule(
             Name=self.properties["rule_name"],
@@ -37,26 +48,21 @@ class EventBridgeRule(BaseResource):
             State=self.properties.get("state", "ENABLED"),
             Description=self.properties.get("description", "")
         )
-        targets = self.properties["targets"]
-        for target in targets:
-            target["Id"] = f"{target['Arn'].split('/')[-1]}-{target.get('Id', '1')}"
         self.client.put_targets(
             Rule=self.properties["rule_name"],
-            Targets=targets
+            Targets=self._desired_targets()
         )
         self.client.tag_resource(
             ResourceARN=self._get_rule_arn(),
             Tags=[{"Key": k, "Value": v} for k, v in self.tags.items()]
         )
+        self.invalidate()
         self.outputs = self.get_outputs()
 
     def update(self, existing_properties):
         rule_name = self.properties["rule_name"]
-        if (
-            self.properties["schedule_expression"] != existing_properties["schedule_expression"] or
-            self.properties.get("state", "ENABLED") != existing_properties.get("state") or
-            self.properties.get("description", "") != existing_properties.get("description")
-        ):
+        changed = self.changed_fields(existing_properties)
+        if changed & {"schedule_expression", "state", "description"}:
             self.client.put_rule(
                 Name=rule_name,
                 ScheduleExpression=self.properties["schedule_expression"],
@@ -64,22 +70,21 @@ class EventBridgeRule(BaseResource):
                 Description=self.properties.get("description", "")
             )
 
-        existing_targets = {t["Id"]: t for t in existing_properties.get("targets", [])}
-        new_targets = self.properties["targets"]
-        for target in new_targets:
-            target["Id"] = f"{target['Arn'].split('/')[-1]}-{target.get('Id', '1')}"
-        new_target_ids = {t["Id"] for t in new_targets}
+        if "targets" in changed:
+            existing_targets = {t["Id"]: t for t in existing_properties.get("targets", [])}
+            new_targets = self._desired_targets()
+            new_target_ids = {t["Id"] for t in new_targets}
 
-        # Remove outdated targets
-        for target_id in existing_targets:
-            if target_id not in new_target_ids:
-                self.client.remove_targets(Rule=rule_name, Ids=[target_id])
+            # Remove outdated targets
+            for target_id in existing_targets:
+                if target_id not in new_target_ids:
+                    self.client.remove_targets(Rule=rule_name, Ids=[target_id])
 
-        # Update or add new targets
-        if new_targets:
-            self.client.put_targets(Rule=rule_name, Targets=new_targets)
+            # Update or add new targets
+            if new_targets:
+                self.client.put_targets(Rule=rule_name, Targets=new_targets)
 
-        if self.tags != existing_properties.get("tags", {}):
+        if "tags" in changed:
             existing_tags = self.client.list_tags_for_resource(ResourceARN=self._get_rule_arn()).get("Tags", [])
             if existing_tags:
                 self.client.untag_resource(ResourceARN=self._get_rule_arn(), TagKeys=[t["Key"] for t in existing_tags])
@@ -88,8 +93,28 @@ class EventBridgeRule(BaseResource):
                 Tags=[{"Key": k, "Value": v} for k, v in self.tags.items()]
             )
 
+        self.invalidate()
         self.outputs = self.get_outputs()
 
+    def _desired_targets(self):
+        return [
+            {**target, "Id": f"{target['Arn'].split('/')[-1]}-{target.get('Id', '1')}"}
+            for target in self.properties["targets"]
+        ]
+
+    def desired_value(self, field):
+        if field == "targets":
+            return self._desired_targets()
+        return super().desired_value(field)
+
+    def normalize(self, field, value):
+        if field == "targets":
+            return sorted(
+                ({k: t[k] for k in ("Id", "Arn", "Input") if k in t} for t in value or []),
+                key=lambda t: t["Id"]
+            )
+        return super().normalize(field, value)
+
     def _get_rule_arn(self):
         return f"arn:aws:events:{self.client.meta.region_name}:{self.client.meta.account_id}:rule/{self.properties['rule_name']}"
 
@@ -103,7 +128,7 @@ class EventBridgeRule(BaseResource):
 
     def get_existing_properties(self):
         try:
-            rule = self.client.describe_rule(Name=self.properties["rule_name"])
+            rule = self._describe_rule()
             targets = self.client.list_targets_by_rule(Rule=self.properties["rule_name"]).get("Targets", [])
             tags = self.client.list_tags_for_resource(ResourceARN=self._get_rule_arn()).get("Tags", [])
             return {
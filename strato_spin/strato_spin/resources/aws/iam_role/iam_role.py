@@ -1,6 +1,10 @@
 from ....core.base_resource import BaseResource
+from ....core.diff import canonical_json
+from ....core.inventory import paginate
+from ....core.waiter import Pending
 import json
 import logging
+import re
 import botocore.exceptions
 
 logger = logging.getLogger(__name__)
@@ -8,6 +12,8 @@ logger = logging.getLogger(__name__)
 class IAMRole(BaseResource):
     resource_type = "iam_role"
     platform = "aws"
+    managed_fields = ["trust_policy", "description", "inline_policies", "tags"]
+    self_output_fields = ["arn"]
 
     @classmethod
     def get_schema(cls):
@@ -23,13 +29,22 @@ class IAMRole(BaseResource):
             }
         }
 
+    @classmethod
+    def list_inventory(cls, client):
+        return {role["RoleName"]: role["Arn"] for role in paginate(client, "list_roles", "Roles")}
+
     def exists(self):
+        if self.inventory is not None:
+            return self.properties["role_name"] in self.inventory
         try:
-            self.client.get_role(RoleName=self.properties["role_name"])
+            self._get_role()
             return True
         except self.client.exceptions.NoSuchEntityException:
             return False
 
+    def _get_role(self):
+        return self.observe("get_role", lambda: self.client.get_role(RoleName=self.properties["role_name"])["Role"])
+
     def create(self):
         trust_policy = self.properties["trust_policy"]
         if isinstance(trust_policy, dict):
@@ -38,7 +53,7 @@ class IAMRole(BaseResource):
             RoleName=self.properties["role_name"],
             AssumeRolePolicyDocument=trust_policy,
             Description=self.properties.get("description", ""),
-            Tags=[{"Key": k, "TagValue": v} for k, v in self.tags.items()]
+            Tags=[{"Key": k, "Value": v} for k, v in self.tags.items()]
         )
         self.self_outputs = {"arn": response["Role"]["Arn"]}
         for policy in self.properties.get("inline_policies", []):
@@ -50,55 +65,74 @@ class IAMRole(BaseResource):
                 PolicyName=policy["name"],
                 PolicyDocument=policy_document
             )
+        self.invalidate()
         self.outputs = self.get_outputs()
+        # IAM is eventually consistent; dependents such as Lambda fail until the role is visible
+        return Pending(f"role {self.properties['role_name']} to propagate", self._get_role_fresh, interval=1)
+
+    def _get_role_fresh(self):
+        self.invalidate("get_role")
+        try:
+            return self._get_role()
+        except self.client.exceptions.NoSuchEntityException:
+            return None
 
     def update(self, existing_properties):
         role_name = self.properties["role_name"]
-        trust_policy = self.properties["trust_policy"]
-        if isinstance(trust_policy, dict):
-            trust_policy = json.dumps(trust_policy)
-        if trust_policy != existing_properties.get("trust_policy"):
+        self.self_outputs = {"arn": existing_properties["arn"]}
+        changed = self.changed_fields(existing_properties)
+        if "trust_policy" in changed:
+            trust_policy = self.properties["trust_policy"]
+            if isinstance(trust_policy, dict):
+                trust_policy = json.dumps(trust_policy)
             self.client.update_assume_role_policy(
                 RoleName=role_name,
                 PolicyDocument=trust_policy
             )
 
-        description = self.properties.get("description", "")
-        if description != existing_properties.get("description", ""):
+        if "description" in changed:
             self.client.update_role(
                 RoleName=role_name,
-                Description=description
+                Description=self.properties.get("description", "")
             )
 
-        existing_policies = existing_properties.get("inline_policies", {})
-        for policy in self.properties.get("inline_policies", []):
-            policy_name = policy["name"]
-            policy_document = policy["policy"]
-            if isinstance(policy_document, dict):
-                policy_document = json.dumps(self._replace_self_references(policy_document))
-            if policy_name not in existing_policies or policy_document != existing_policies.get(policy_name):
-                self.client.put_role_policy(
-                    RoleName=role_name,
-                    PolicyName=policy_name,
-                    PolicyDocument=policy_document
-                )
-
-        for policy_name in existing_policies:
-            if not any(p["name"] == policy_name for p in self.properties.get("inline_policies", [])):
-                self.client.delete_role_policy(
-                    RoleName=role_name,
-                    PolicyName=policy_name
-                )
-
-        if self.tags != existing_properties.get("tags", {}):
+        if "inline_policies" in changed:
+            existing_policies = self.normalize("inline_policies", existing_properties.get("inline_policies", {}))
+            desired_policies = self.normalize("inline_policies", self.desired_value("inline_policies"))
+            for policy_name, policy_document in desired_policies.items():
+                if policy_document != existing_policies.get(policy_name):
+                    self.client.put_role_policy(
+                        RoleName=role_name,
+                        PolicyName=policy_name,
+                        PolicyDocument=policy_document
+                    )
+
+            for policy_name in existing_policies:
+                if policy_name not in desired_policies:
+                    self.client.delete_role_policy(
+                        RoleName=role_name,
+                        PolicyName=policy_name
+                    )
+
+        if "tags" in changed:
             existing_tags = self.client.list_role_tags(RoleName=role_name).get("Tags", [])
             if existing_tags:
                 self.client.untag_role(RoleName=role_name, TagKeys=[t["Key"] for t in existing_tags])
-            self.client.tag_role(RoleName=role_name, Tags=[{"Key": k, "TagValue": v} for k, v in self.tags.items()])
+            self.client.tag_role(RoleName=role_name, Tags=[{"Key": k, "Value": v} for k, v in self.tags.items()])
 
-        self.self_outputs = {"arn": existing_properties["arn"]}
+        self.invalidate()
         self.outputs = self.get_outputs()
 
+    def normalize(self, field, value):
+        if field == "trust_policy":
+            return canonical_json(value)
+        if field == "inline_policies":
+            # Desired policies are a list of {name, policy}; observed ones a {name: document} map
+            if isinstance(value, list):
+                value = {p["name"]: self._replace_self_references(p["policy"]) for p in value}
+            return {name: canonical_json(document) for name, document in (value or {}).items()}
+        return super().normalize(field, value)
+
     def _replace_self_references(self, policy):
         """Replace ${self.<field>} in policy with self_outputs"""
         def recursive_replace(obj):
@@ -122,19 +156,19 @@ class IAMRole(BaseResource):
     def get_existing_properties(self):
         role_name = self.properties["role_name"]
         try:
-            role = self.client.get_role(RoleName=role_name)["Role"]
-            trust_policy = json.loads(role["AssumeRolePolicyDocument"])
+            role = self._get_role()
+            trust_policy = canonical_json(role["AssumeRolePolicyDocument"])
             tags = self.client.list_role_tags(RoleName=role_name).get("Tags", [])
             inline_policies = {}
             for policy_name in self.client.list_role_policies(RoleName=role_name)["PolicyNames"]:
                 policy_doc = self.client.get_role_policy(RoleName=role_name, PolicyName=policy_name)["PolicyDocument"]
-                inline_policies[policy_name] = json.dumps(policy_doc)
+                inline_policies[policy_name] = canonical_json(policy_doc)
             return {
                 "role_name": role_name,
-                "trust_policy": json.dumps(trust_policy),
+                "trust_policy": trust_policy,
                 "description": role.get("Description", ""),
                 "inline_policies": inline_policies,
-                "tags": {t["Key"]: t["TagValue"] for t in tags},
+                "tags": {t["Key"]: t["Value"] for t in tags},
                 "arn": role["Arn"]
             }
         except self.client.exceptions.NoSuchEntityException:
@@ -1,4 +1,7 @@
 from ....core.base_resource import BaseResource
+from ....core.diff import canonical_json
+from ....core.inventory import paginate
+from ....core.waiter import Pending
 import json
 import logging
 import re
@@ -8,6 +11,8 @@ logger = logging.getLogger(__name__)
 class KMSKey(BaseResource):
     resource_type = "kms_key"
     platform = "aws"
+    managed_fields = ["policy", "tags"]
+    self_output_fields = ["arn", "key_id"]
 
     @classmethod
     def get_schema(cls):
@@ -23,17 +28,65 @@ class KMSKey(BaseResource):
             }
         }
 
+    @classmethod
+    def list_inventory(cls, client):
+        return {
+            alias["AliasName"]: alias.get("TargetKeyId")
+            for alias in paginate(client, "list_aliases", "Aliases")
+        }
+
+    def _aliases(self):
+        if self.inventory is None:
+            self.inventory = self.list_inventory(self.client)
+        return self.inventory
+
+    def _find_key_id(self):
+        return self._aliases().get(self.properties["alias"])
+
     def exists(self):
         try:
-            response = self.client.list_aliases()
-            for alias in response["Aliases"]:
-                if alias["AliasName"] == self.properties["alias"]:
-                    return True
-            return False
+            return self.properties["alias"] in self._aliases()
         except self.client.exceptions.ClientError:
             return False
 
     def create(self):
+        response = self.client.create_key(
+            Description=self.properties.get("description", ""),
+            Policy=json.dumps(self._replace_self_references(self._build_policy())),
+            Tags=[{"TagKey": k, "TagValue": v} for k, v in self.tags.items()]
+        )
+        key_id = response["KeyMetadata"]["KeyId"]
+        self.self_outputs = {"arn": response["KeyMetadata"]["Arn"], "key_id": key_id}
+        self.client.create_alias(
+            AliasName=self.properties["alias"],
+            TargetKeyId=key_id
+        )
+        self.outputs = self.get_outputs()
+        return Pending(
+            f"key {self.properties['alias']} to be enabled",
+            lambda: self.client.describe_key(KeyId=key_id)["KeyMetadata"],
+            lambda metadata: metadata["KeyState"] == "Enabled"
+        )
+
+    def update(self, existing_properties):
+        key_id = self._find_key_id()
+        self.self_outputs = {"arn": existing_properties["arn"], "key_id": key_id}
+        changed = self.changed_fields(existing_properties)
+        if key_id:
+            if "tags" in changed:
+                existing_tags = self.client.list_resource_tags(KeyId=key_id).get("Tags", [])
+                if existing_tags:
+                    self.client.untag_resource(KeyId=key_id, TagKeys=[t["TagKey"] for t in existing_tags])
+                self.client.tag_resource(KeyId=key_id, Tags=[{"TagKey": k, "TagValue": v} for k, v in self.tags.items()])
+            if "policy" in changed:
+                self.client.set_key_policy(
+                    KeyId=key_id,
+                    PolicyName="default",
+                    Policy=json.dumps(self._replace_self_references(self._build_policy()))
+                )
+        self.outputs = self.get_outputs()
+
+    def _build_policy(self):
         admin_role_arn = self.properties.get("admin_role_arn")
         policy = {
             "Version": "2012-10-17",
@@ -68,75 +121,17 @@ class KMSKey(BaseResource):
                 ],
                 "Resource": "*"
             })
-        response = self.client.create_key(
-            Description=self.properties.get("description", ""),
-            Policy=json.dumps(self._replace_self_references(policy)),
-            Tags=[{"TagKey": k, "TagValue": v} for k, v in self.tags.items()]
-        )
-        key_id = response["KeyMetadata"]["KeyId"]
-        self.self_outputs = {"arn": response["KeyMetadata"]["Arn"], "key_id": key_id}
-        self.client.create_alias(
-            AliasName=self.properties["alias"],
-            TargetKeyId=key_id
-        )
-        self.outputs = self.get_outputs()
+        return policy
 
-    def update(self, existing_properties):
-        response = self.client.list_aliases()
-        key_id = None
-        for alias in response["Aliases"]:
-            if alias["AliasName"] == self.properties["alias"]:
-                key_id = alias["TargetKeyId"]
-                break
-        self.self_outputs = {"arn": existing_properties["arn"], "key_id": key_id}
-        if key_id:
-            if self.tags != existing_properties.get("tags", {}):
-                existing_tags = self.client.list_resource_tags(KeyId=key_id).get("Tags", [])
-                if existing_tags:
-                    self.client.untag_resource(KeyId=key_id, TagKeys=[t["TagKey"] for t in existing_tags])
-                self.client.tag_resource(KeyId=key_id, Tags=[{"TagKey": k, "TagValue": v} for k, v in self.tags.items()])
-            admin_role_arn = self.properties.get("admin_role_arn")
-            policy = {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Principal": {"AWS": "arn:aws:iam::*:root"},
-                        "Action": "kms:*",
-                        "Resource": "*"
-                    }
-                ]
-            }
-            if admin_role_arn:
-                policy["Statement"].append({
-                    "Effect": "Allow",
-                    "Principal": {"AWS": admin_role_arn},
-                    "Action": [
-                        "kms:Create*",
-                        "kms:Describe*",
-                        "kms:Enable*",
-                        "kms:List*",
-                        "kms:Put*",
-                        "kms:Update*",
-                        "kms:Revoke*",
-                        "kms:Disable*",
-                        "kms:Get*",
-                        "kms:Delete*",
-                        "kms:TagResource",
-                        "kms:UntagResource",
-                        "kms:ScheduleKeyDeletion",
-                        "kms:CancelKeyDeletion"
-                    ],
-                    "Resource": "*"
-                })
-            policy_json = json.dumps(self._replace_self_references(policy))
-            if policy_json != existing_properties.get("policy"):
-                self.client.set_key_policy(
-                    KeyId=key_id,
-                    PolicyName="default",
-                    Policy=policy_json
-                )
-        self.outputs = self.get_outputs()
+    def desired_value(self, field):
+        if field == "policy":
+            return self._replace_self_references(self._build_policy())
+        return super().desired_value(field)
+
+    def normalize(self, field, value):
+        if field == "policy":
+            return canonical_json(value)
+        return super().normalize(field, value)
 
     def _replace_self_references(self, policy):
         """Replace ${self.<field>} in policy with self_outputs"""
@@ -160,18 +155,16 @@ class KMSKey(BaseResource):
         }
 
     def get_existing_properties(self):
-        response = self.client.list_aliases()
-        for alias in response["Aliases"]:
-            if alias["AliasName"] == self.properties["alias"]:
-                key_id = alias["TargetKeyId"]
-                tags = self.client.list_resource_tags(KeyId=key_id).get("Tags", [])
-                policy = self.client.get_key_policy(KeyId=key_id, PolicyName="default").get("Policy")
-                policy = json.loads(policy) if policy else None
-                return {
-                    "alias": alias["AliasName"],
-                    "tags": {t["TagKey"]: t["TagValue"] for t in tags},
-                    "arn": f"arn:aws:kms:{self.client.meta.region_name}:{self.client.meta.account_id}:key/{key_id}",
-                    "key_id": key_id,
-                    "policy": policy
-                }
-        return {}
+        key_id = self._find_key_id()
+        if not key_id:
+            return {}
+        tags = self.client.list_resource_tags(KeyId=key_id).get("Tags", [])
+        policy = self.client.get_key_policy(KeyId=key_id, PolicyName="default").get("Policy")
+        policy = json.loads(policy) if policy else None
+        return {
+            "alias": self.properties["alias"],
+            "tags": {t["TagKey"]: t["TagValue"] for t in tags},
+            "arn": f"arn:aws:kms:{self.client.meta.region_name}:{self.client.meta.account_id}:key/{key_id}",
+            "key_id": key_id,
+            "policy": policy
+        }
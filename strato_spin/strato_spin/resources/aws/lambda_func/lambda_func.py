@@ -1,7 +1,9 @@
 from ....core.base_resource import BaseResource
-from .packager import Packager
-import os
-import tempfile
+from ....core.diff import UNKNOWN, is_unresolved
+from ....core.inventory import paginate
+from ....core.tracing import tracer
+from ....core.waiter import Pending
+from .packager import Packager, build_artifact
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,6 +11,12 @@ logger = logging.getLogger(__name__)
 class LambdaFunction(BaseResource):
     resource_type = "lambda_function"
     platform = "aws"
+    extra_services = ["s3"]
+    managed_fields = [
+        "runtime", "handler", "role_arn", "timeout", "memory_size", "environment", "layers", "code_sha256", "tags"
+    ]
+    # Fields applied by update_function_configuration
+    configuration_fields = ["runtime", "handler", "role_arn", "timeout", "memory_size", "environment", "layers"]
 
     @classmethod
     def get_schema(cls):
@@ -21,6 +29,8 @@ class LambdaFunction(BaseResource):
                 "code_s3_bucket": None,
                 "code_s3_key": None,
                 "dependency_manager": "pip",
+                "include": [],
+                "exclude": [],
                 "layers": [],
                 "environment": {}
             },
@@ -30,65 +40,124 @@ class LambdaFunction(BaseResource):
             }
         }
 
-    def __init__(self, name, properties, tags, schema, client):
-        super().__init__(name, properties, tags, schema, client)
-        self.s3_client = client.meta.client("s3")
-        self.packager = None
-        if "source_dir" in properties:
-            self.packager = Packager(self.s3_client, properties.get("code_s3_bucket"), self.name)
+    def __init__(self, name, properties, tags, schema, client, clients=None):
+        super().__init__(name, properties, tags, schema, client, clients)
+        self.s3_client = self.clients["s3"]
+        self._packager = None
+        # Artifacts started by prebuild(), as futures keyed by (kind, source_dir, dependency_manager)
+        self._prebuilt = {}
+
+    @property
+    def packager(self):
+        # Built on first use so code_s3_bucket is resolved against upstream outputs
+        if self._packager is None:
+            self._packager = Packager(
+                self.s3_client, self.properties.get("code_s3_bucket"), self.name, self.properties.get("runtime"),
+                prebuilt=self._prebuilt
+            )
+        return self._packager
+
+    def source_paths(self):
+        paths = [layer["source_dir"] for layer in self.properties.get("layers", [])]
+        if self.properties.get("source_dir"):
+            paths.append(self.properties["source_dir"])
+        return paths
+
+    def _code_source(self):
+        return self.properties.get("source_dir") or self.properties.get("code_s3_key")
+
+    def _code_patterns(self):
+        """The include and exclude globs applied to source_dir when it is zipped."""
+        return self.properties.get("include") or None, self.properties.get("exclude") or None
+
+    def prebuild(self, executor):
+        # Packaging needs only local files, so it can overlap with the role and bucket being deployed
+        runtime = self.properties.get("runtime")
+        builds = [(
+            "function", self.properties.get("source_dir"), self.properties.get("dependency_manager", "pip"),
+            *self._code_patterns()
+        )]
+        for layer in self.properties.get("layers", []):
+            builds.append(("layer", layer.get("source_dir"), layer.get("dependency_manager", "pip"), None, None))
+        for kind, source_dir, dependency_manager, include, exclude in builds:
+            if not source_dir or is_unresolved([source_dir, dependency_manager, runtime, include, exclude]):
+                continue
+            self._prebuilt.setdefault(
+                (kind, source_dir, dependency_manager),
+                executor.submit(
+                    build_artifact, kind, source_dir, dependency_manager, runtime, self.name, include, exclude,
+                    tracer.enabled
+                )
+            )
+
+    @classmethod
+    def list_inventory(cls, client):
+        return {function["FunctionName"]: function for function in paginate(client, "list_functions", "Functions")}
 
     def exists(self):
-        try:
-            self.client.get_function(FunctionName=self.properties["function_name"])
-            return True
-        except self.client.exceptions.ResourceNotFoundException:
-            return False
-
-    def delete_old_layers(self):
-        try:
-            response = self.client.get_function(FunctionName=self.properties["function_name"])
-            existing_layers = response["Configuration"].get("Layers", [])
-            for layer in existing_layers:
-                layer_arn = layer["Arn"]
-                layer_name = layer_arn.split(":")[6]
-                try:
-                    self.client.delete_layer_version(LayerName=layer_name, VersionNumber=1)
-                except self.client.exceptions.ResourceNotFoundException:
-                    pass
-        except self.client.exceptions.ResourceNotFoundException:
-            pass
+        if self.inventory is not None:
+            return self.properties["function_name"] in self.inventory
+        return self._get_function() is not None
 
-    def create(self):
+    def _get_function(self):
+        def fetch():
+            try:
+                return self.client.get_function(FunctionName=self.properties["function_name"])
+            except self.client.exceptions.ResourceNotFoundException:
+                return None
+        return self.observe("get_function", fetch)
+
+    def _layer_key(self, layer):
+        return self.packager.key("layer", layer["source_dir"], layer.get("dependency_manager", "pip"))
+
+    def _published_layer(self, layer):
+        """ARN of the newest layer version already published from the same content, or None."""
+        def fetch():
+            try:
+                versions = list(paginate(self.client, "list_layer_versions", "LayerVersions", LayerName=layer["name"]))
+            except self.client.exceptions.ResourceNotFoundException:
+                return None
+            key = self._layer_key(layer)
+            for version in sorted(versions, key=lambda v: v["Version"], reverse=True):
+                if key in version.get("Description", ""):
+                    return version["LayerVersionArn"]
+            return None
+        return self.observe(f"layer:{layer['name']}", fetch)
+
+    def _publish_layers(self):
         layer_arns = []
         for layer in self.properties.get("layers", []):
-            layer_name = layer["name"]
-            source_dir = layer["source_dir"]
-            dependency_manager = layer.get("dependency_manager", "pip")
-            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as temp_zip:
-                self.packager.package_layer(source_dir, temp_zip.name, dependency_manager)
-                s3_key = self.packager.upload_to_s3(temp_zip.name, "layers")
-                response = self.client.publish_layer_version(
-                    LayerName=layer_name,
-                    Content={"S3Bucket": self.properties["code_s3_bucket"], "S3Key": s3_key},
-                    CompatibleRuntimes=layer.get("compatible_runtimes", []),
-                    Description=f"Layer for {self.properties['function_name']}"
-                )
-                layer_arns.append(response["LayerVersionArn"])
-            os.unlink(temp_zip.name)
+            published = self._published_layer(layer)
+            if published:
+                layer_arns.append(published)
+                continue
+            s3_key, _ = self.packager.artifact("layer", layer["source_dir"], layer.get("dependency_manager", "pip"))
+            # The content key in the description lets later deploys reuse this version
+            response = self.client.publish_layer_version(
+                LayerName=layer["name"],
+                Content={"S3Bucket": self.properties["code_s3_bucket"], "S3Key": s3_key},
+                CompatibleRuntimes=layer.get("compatible_runtimes", []),
+                Description=f"Layer for {self.properties['function_name']} ({self._layer_key(layer)})"
+            )
+            layer_arns.append(response["LayerVersionArn"])
+        return layer_arns
 
-        code_config = {}
+    def _code_location(self):
+        """S3 location of the function code, packaged and uploaded by content key when built from source_dir."""
         if "source_dir" in self.properties:
-            dependency_manager = self.properties.get("dependency_manager", "pip")
-            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as temp_zip:
-                self.packager.package_lambda(self.properties["source_dir"], temp_zip.name, dependency_manager)
-                s3_key = self.packager.upload_to_s3(temp_zip.name, "lambda")
-                code_config = {"S3Bucket": self.properties["code_s3_bucket"], "S3Key": s3_key}
-            os.unlink(temp_zip.name)
-        else:
-            code_config = {
-                "S3Bucket": self.properties["code_s3_bucket"],
-                "S3Key": self.properties["code_s3_key"]
-            }
+            s3_key, _ = self.packager.artifact(
+                "function", self.properties["source_dir"], self.properties.get("dependency_manager", "pip"),
+                *self._code_patterns()
+            )
+            return {"S3Bucket": self.properties["code_s3_bucket"], "S3Key": s3_key}
+        return {
+            "S3Bucket": self.properties["code_s3_bucket"],
+            "S3Key": self.properties["code_s3_key"]
+        }
+
+    def create(self):
+        layer_arns = self._publish_layers()
+        code_config = self._code_location()
 
         self.client.create_function(
             FunctionName=self.properties["function_name"],
@@ -102,62 +171,97 @@ class LambdaFunction(BaseResource):
             Layers=layer_arns,
             Tags=self.tags
         )
+        self.invalidate()
         self.outputs = self.get_outputs()
+        return self._until_settled("to become active")
 
     def update(self, existing_properties):
-        self.delete_old_layers()
-        layer_arns = []
-        for layer in self.properties.get("layers", []):
-            layer_name = layer["name"]
-            source_dir = layer["source_dir"]
-            dependency_manager = layer.get("dependency_manager", "pip")
-            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as temp_zip:
-                self.packager.package_layer(source_dir, temp_zip.name, dependency_manager)
-                s3_key = self.packager.upload_to_s3(temp_zip.name, "layers")
-                response = self.client.publish_layer_version(
-                    LayerName=layer_name,
-                    Content={"S3Bucket": self.properties["code_s3_bucket"], "S3Key": s3_key},
-                    CompatibleRuntimes=layer.get("compatible_runtimes", []),
-                    Description=f"Layer for {self.properties['function_name']}"
-                )
-                layer_arns.append(response["LayerVersionArn"])
-            os.unlink(temp_zip.name)
-
-        code_config = {}
-        if "source_dir" in self.properties:
-            dependency_manager = self.properties.get("dependency_manager", "pip")
-            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as temp_zip:
-                self.packager.package_lambda(self.properties["source_dir"], temp_zip.name, dependency_manager)
-                s3_key = self.packager.upload_to_s3(temp_zip.name, "lambda")
-                code_config = {"S3Bucket": self.properties["code_s3_bucket"], "S3Key": s3_key}
-            os.unlink(temp_zip.name)
+        """Send only the calls whose part changed: code, configuration and tags are compared separately."""
+        changed = self.changed_fields(existing_properties)
+        if "layers" in changed:
+            layer_arns = self._publish_layers()
         else:
-            code_config = {
-                "S3Bucket": self.properties["code_s3_bucket"],
-                "S3Key": self.properties["code_s3_key"]
-            }
+            layer_arns = existing_properties.get("layers", [])
 
-        self.client.update_function_code(
-            FunctionName=self.properties["function_name"],
-            S3Bucket=code_config["S3Bucket"],
-            S3Key=code_config["S3Key"]
-        )
-        self.client.update_function_configuration(
-            FunctionName=self.properties["function_name"],
-            Runtime=self.properties["runtime"],
-            Role=self.properties["role_arn"],
-            Handler=self.properties["handler"],
-            Timeout=self.properties.get("timeout", 30),
-            MemorySize=self.properties.get("memory_size", 128),
-            Environment={"Variables": self.properties.get("environment", {})},
-            Layers=layer_arns
-        )
-        if self.tags != existing_properties.get("tags", {}):
-            self.client.tag_resource(
-                Resource=f"arn:aws:lambda:{self.client.meta.region_name}:{self.client.meta.account_id}:function:{self.properties['function_name']}",
-                Tags=self.tags
+        if "code_sha256" in changed:
+            code_config = self._code_location()
+            self.client.update_function_code(
+                FunctionName=self.properties["function_name"],
+                S3Bucket=code_config["S3Bucket"],
+                S3Key=code_config["S3Key"]
+            )
+            # The configuration update conflicts with an in-progress code update, so it runs once the code settles
+            return self._until_settled(
+                "code update",
+                then=lambda: self._update_configuration(changed, layer_arns, existing_properties)
+            )
+        return self._update_configuration(changed, layer_arns, existing_properties)
+
+    def _update_configuration(self, changed, layer_arns, existing_properties):
+        configure = any(field in changed for field in self.configuration_fields)
+        if configure:
+            self.client.update_function_configuration(
+                FunctionName=self.properties["function_name"],
+                Runtime=self.properties["runtime"],
+                Role=self.properties["role_arn"],
+                Handler=self.properties["handler"],
+                Timeout=self.properties.get("timeout", 30),
+                MemorySize=self.properties.get("memory_size", 128),
+                Environment={"Variables": self.properties.get("environment", {})},
+                Layers=layer_arns
             )
+        if "tags" in changed:
+            function_arn = self.get_outputs()["properties"]["arn"]
+            removed = [key for key in existing_properties.get("tags") or {} if key not in self.tags]
+            if removed:
+                self.client.untag_resource(Resource=function_arn, TagKeys=removed)
+            self.client.tag_resource(Resource=function_arn, Tags=self.tags)
+        self.invalidate()
         self.outputs = self.get_outputs()
+        if configure:
+            return self._until_settled("configuration update")
+        return None
+
+    def _until_settled(self, description, then=None):
+        function_name = self.properties["function_name"]
+
+        def settled(config):
+            if config.get("State") == "Failed" or config.get("LastUpdateStatus") == "Failed":
+                reason = config.get("StateReason") or config.get("LastUpdateStatusReason")
+                raise ValueError(f"Lambda function {function_name} failed: {reason}")
+            return config.get("State") == "Active" and config.get("LastUpdateStatus") != "InProgress"
+
+        return Pending(
+            f"function {function_name} {description}",
+            lambda: self.client.get_function_configuration(FunctionName=function_name),
+            settled,
+            then=then,
+            interval=1
+        )
+
+    def desired_value(self, field):
+        if field == "code_sha256":
+            if self.properties.get("source_dir"):
+                return self.observe("code_sha256", lambda: self.packager.code_sha256(
+                    "function", self.properties["source_dir"], self.properties.get("dependency_manager", "pip"),
+                    *self._code_patterns()
+                ))
+            bucket, s3_key = self.properties.get("code_s3_bucket"), self.properties.get("code_s3_key")
+            if not s3_key:
+                return None
+            if is_unresolved([bucket, s3_key]):
+                return s3_key
+            return self.observe("code_sha256", lambda: self.packager.object_sha256(bucket, s3_key))
+        if field == "layers":
+            return [self._published_layer(layer) or UNKNOWN for layer in self.properties.get("layers", [])]
+        return super().desired_value(field)
+
+    def normalize(self, field, value):
+        if field == "environment":
+            return {str(k): str(v) for k, v in (value or {}).items()}
+        if field in ("timeout", "memory_size") and value is not None:
+            return int(value)
+        return super().normalize(field, value)
 
     def get_outputs(self):
         return {
@@ -168,16 +272,16 @@ class LambdaFunction(BaseResource):
         }
 
     def get_existing_properties(self):
-        response = self.client.get_function(FunctionName=self.properties["function_name"])
-        config = response["Configuration"]
-        tags = self.client.list_tags(
-            Resource=f"arn:aws:lambda:{self.client.meta.region_name}:{self.client.meta.account_id}:function:{self.properties['function_name']}"
-        ).get("Tags", {})
+        function = self._get_function()
+        config = function["Configuration"]
         return {
             "runtime": config["Runtime"],
             "handler": config["Handler"],
             "timeout": config["Timeout"],
             "memory_size": config["MemorySize"],
-            "environment": config["Environment"].get("Variables", {}),
-            "tags": tags
+            "role_arn": config["Role"],
+            "environment": config.get("Environment", {}).get("Variables", {}),
+            "layers": [layer["Arn"] for layer in config.get("Layers", [])],
+            "code_sha256": config["CodeSha256"] if self._code_source() else None,
+            "tags": function.get("Tags", {})
         }
@@ -1,77 +1,432 @@
 import os
+import re
+import stat
+import sys
 import shutil
+import sysconfig
+import threading
+import tomllib
 import zipfile
 import subprocess
 import tempfile
-import uuid
-import boto3
-from poetry.factory import Factory
+import base64
+import hashlib
+import json
+from collections import namedtuple
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from urllib.parse import unquote, urlparse
+from botocore.exceptions import ClientError
+from ....core.diff import is_unresolved
+from ....core.state import hash_spec, hash_tree, user_cache_dir
+from ....core.tracing import tracer
 import logging
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+# Bump when packaging output changes, so cached and uploaded artifacts are rebuilt
+ARTIFACT_FORMAT = 3
+ARTIFACT_PREFIXES = {"function": "lambda", "layer": "layers"}
+DEPENDENCY_FILES = {"pip": ["requirements.txt"], "poetry": ["pyproject.toml", "poetry.lock"]}
+# Never shipped from a function's source_dir, on top of its own exclude globs
+DEFAULT_EXCLUDES = ["__pycache__", "*.pyc", ".git"]
+# Zip entries carry this timestamp so identical files always give identical bytes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# A built zip in the local artifact cache; code_sha256 is base64 like Lambda's CodeSha256
+# trace holds the spans of a build that ran in a worker process, as exported by its tracer
+Artifact = namedtuple("Artifact", ["key", "path", "code_sha256", "trace"], defaults=(None,))
+
+def artifact_key(kind, source_dir, dependency_manager="pip", runtime=None, include=None, exclude=None):
+    """Content hash of everything that goes into an artifact: shipped files, pinned dependencies and runtime.
+
+    A function counts only the files its zip would hold, so edits to excluded files keep the artifact;
+    a layer ships only dependencies, so only its dependency files count.
+    """
+    dependencies = {
+        name: hash_tree(os.path.join(source_dir, name))
+        for name in DEPENDENCY_FILES.get(dependency_manager, [])
+        if os.path.exists(os.path.join(source_dir, name))
+    }
+    if dependency_manager == "pip" and dependencies:
+        # -r files are inlined and -c files hashed, wherever they live
+        dependencies["resolved"] = [
+            (line, hash_tree(line[3:]) if line.startswith("-c ") else None)
+            for line in resolve_requirements(source_dir)
+        ]
+    sources = None
+    if kind == "function":
+        files = collect_files(source_dir, include=include, exclude=DEFAULT_EXCLUDES + list(exclude or []))
+        sources = sorted((arcname, file_sha256(path)) for arcname, path in files)
+    return hash_spec(ARTIFACT_FORMAT, kind, sources, dependency_manager, dependencies, runtime)
+
+def _matches(relative_path, patterns):
+    """Whether a glob matches the path itself or any directory or file name along it."""
+    parts = relative_path.split("/")
+    return any(fnmatch(relative_path, pattern) or any(fnmatch(part, pattern) for part in parts) for pattern in patterns)
+
+def collect_files(root, prefix="", include=None, exclude=None):
+    """(arcname, path) for every file under root that matches include (if given) and not exclude."""
+    exclude = list(exclude or [])
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(dirpath, root)
+        relative_dir = "" if relative_dir == "." else relative_dir.replace(os.sep, "/") + "/"
+        dirnames[:] = [name for name in dirnames if not _matches(relative_dir + name, exclude)]
+        for name in filenames:
+            relative_path = relative_dir + name
+            if _matches(relative_path, exclude) or (include and not _matches(relative_path, include)):
+                continue
+            files.append((prefix + relative_path, os.path.join(dirpath, name)))
+    return files
+
+def write_zip(output_zip, files):
+    """Stream files, given as (arcname, path), into a byte-reproducible zip.
+
+    Entries are sorted and get a fixed timestamp and permissions; a later file replaces an
+    earlier one with the same arcname. Nothing is staged on disk besides the zip itself.
+    """
+    entries = dict(files)
+    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for arcname in sorted(entries):
+            path = entries[arcname]
+            info = zipfile.ZipInfo(arcname, ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 3
+            file_stat = os.stat(path)
+            mode = 0o755 if file_stat.st_mode & 0o111 else 0o644
+            info.external_attr = (stat.S_IFREG | mode) << 16
+            info.file_size = file_stat.st_size
+            with open(path, "rb") as source, zipf.open(info, "w") as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return base64.b64encode(digest.digest()).decode("ascii")
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+def _lock(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock shared with build processes; only threads are serialised where fcntl is unavailable."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def build_artifact(kind, source_dir, dependency_manager="pip", runtime=None, resource_name=None,
+                   include=None, exclude=None, trace=False, key=None):
+    """Return the cached zip for a function or layer, building it only if its content key is new.
+
+    Module-level so deploys can run it in a process pool ahead of the resource that needs it. A worker
+    process has its own tracer, so with trace=True its spans come back on the Artifact for the parent
+    to merge; only pass it when running in a worker, as it resets the process's tracer. A caller that
+    already has the artifact_key passes it as key, saving another pass over the sources.
+    """
+    if trace:
+        tracer.enable()
+    key = key or artifact_key(kind, source_dir, dependency_manager, runtime, include, exclude)
+    path = user_cache_dir("artifacts", f"{key}.zip")
+    with _lock(key), _file_lock(path.with_suffix(".lock")):
+        if path.exists():
+            logger.debug(f"Reusing cached {kind} artifact {key} for {source_dir}")
+        else:
+            packager = Packager(None, None, resource_name or os.path.basename(source_dir), runtime)
+            temp_zip = path.with_suffix(f".{os.getpid()}.tmp")
+            if kind == "layer":
+                packager.package_layer(source_dir, str(temp_zip), dependency_manager)
+            else:
+                packager.package_lambda(source_dir, str(temp_zip), dependency_manager, include, exclude)
+            os.replace(temp_zip, path)
+    return Artifact(key, str(path), file_sha256(path), tracer.export() if trace else None)
+
+def _canonical_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def _poetry_lock_requirements(source_dir):
+    """Pinned requirements for the main dependencies in poetry.lock, walked from pyproject.toml."""
+    with open(os.path.join(source_dir, "pyproject.toml"), "rb") as f:
+        pyproject = tomllib.load(f)
+    with open(os.path.join(source_dir, "poetry.lock"), "rb") as f:
+        lock = tomllib.load(f)
+    packages = {_canonical_name(package["name"]): package for package in lock.get("package", [])}
+
+    roots = []
+    for name, spec in pyproject.get("tool", {}).get("poetry", {}).get("dependencies", {}).items():
+        if name != "python" and not (isinstance(spec, dict) and spec.get("optional")):
+            roots.append(name)
+    for requirement in pyproject.get("project", {}).get("dependencies", []):
+        roots.append(re.match(r"[A-Za-z0-9._-]+", requirement).group(0))
+
+    requirements = {}
+    pending = [_canonical_name(name) for name in roots]
+    while pending:
+        name = pending.pop()
+        if name in requirements or name not in packages:
+            continue
+        package = packages[name]
+        if package.get("source", {}).get("type") in ("git", "directory", "file", "url"):
+            logger.warning(f"Skipping {package['name']}: only registry packages are installed from poetry.lock")
+            requirements[name] = None
+            continue
+        requirements[name] = f"{package['name']}=={package['version']}"
+        for dependency, spec in package.get("dependencies", {}).items():
+            if not (isinstance(spec, dict) and spec.get("optional")):
+                pending.append(_canonical_name(dependency))
+    return sorted(requirement for requirement in requirements.values() if requirement)
+
+def _poetry_requirements(source_dir):
+    # Without a lock file poetry itself reads the constraints from pyproject.toml
+    from poetry.factory import Factory
+    poetry = Factory().create_poetry(source_dir)
+    return sorted(
+        f"{dep.name}{dep.constraint}" for dep in poetry.package.dependencies
+        if not dep.is_optional() and not dep.is_vcs()
+    )
+
+# A requirement that names one exact version, e.g. "requests==2.31.0" or "boto3[crt]==1.34.0; python_version>'3'"
+PINNED_REQUIREMENT = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*(\[[^\]]*\])?\s*===?\s*[^\s*,;]+\s*(;.*)?")
+# pip options that still matter once every requirement is pinned
+INDEX_OPTION = re.compile(r"(--index-url|--extra-index-url|--find-links|--trusted-host|--pre|-i|-f)\b")
+
+def _read_requirements(path):
+    """Lines of a requirements file with nested -r files inlined and -c paths made absolute."""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r") as f:
+        lines = [line.split(" #")[0].strip() for line in f]
+    requirements = []
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        match = re.match(r"(-r|-c|--requirement|--constraint)[ =]+(.+)", line)
+        if match and match.group(1) in ("-r", "--requirement"):
+            requirements.extend(_read_requirements(os.path.join(base_dir, match.group(2))))
+            continue
+        if match:
+            line = f"-c {os.path.join(base_dir, match.group(2))}"
+        requirements.append(line)
+    return requirements
+
+def resolve_requirements(source_dir, dependency_manager="pip"):
+    """The requirement lines to install for a source dir, from requirements.txt or poetry.lock."""
+    if dependency_manager == "pip":
+        path = os.path.join(source_dir, "requirements.txt")
+        return _read_requirements(path) if os.path.exists(path) else []
+    if dependency_manager == "poetry":
+        if os.path.exists(os.path.join(source_dir, "poetry.lock")):
+            return _poetry_lock_requirements(source_dir)
+        if os.path.exists(os.path.join(source_dir, "pyproject.toml")):
+            return _poetry_requirements(source_dir)
+    return []
+
+def _pin_requirements(requirements, source_dir):
+    """The exact set pip would install for requirements that are not all pinned, from a dry-run report.
+
+    Local directories are keyed on their content hash, so edits to them still invalidate the cache.
+    """
+    with tempfile.TemporaryDirectory(prefix="strato-spin-resolve-") as temp_dir:
+        requirements_file = os.path.join(temp_dir, "requirements.txt")
+        report_file = os.path.join(temp_dir, "report.json")
+        with open(requirements_file, "w") as f:
+            f.write("\n".join(requirements) + "\n")
+        with tracer.span("resolve_dependencies", "lambda", source_dir=source_dir, requirements=len(requirements)):
+            subprocess.check_call([
+                sys.executable, "-m", "pip", "install", "--dry-run", "--ignore-installed", "--quiet",
+                "--report", report_file, "-r", requirements_file,
+                "--cache-dir", str(user_cache_dir("pip")), "--disable-pip-version-check"
+            ], cwd=source_dir)
+        with open(report_file, "r") as f:
+            installs = json.load(f)["install"]
+    pinned = []
+    for item in installs:
+        name, info = item["metadata"]["name"], item["download_info"]
+        if "vcs_info" in info:
+            pinned.append(f"{name} @ {info['vcs_info']['vcs']}+{info['url']}@{info['vcs_info']['commit_id']}")
+        elif "dir_info" in info:
+            local_path = unquote(urlparse(info["url"]).path)
+            pinned.append(f"{name} @ {info['url']} # {hash_tree(local_path)}")
+        elif item.get("is_direct"):
+            pinned.append(f"{name} @ {info['url']}")
+        else:
+            pinned.append(f"{name}=={item['metadata']['version']}")
+    return [line for line in requirements if INDEX_OPTION.match(line)] + sorted(pinned)
+
+def site_packages(source_dir, dependency_manager="pip", runtime=None):
+    """Directory holding a source dir's installed dependencies, or None when it has none.
+
+    The install is cached per (pinned requirements, runtime, platform), so source dirs that share
+    a dependency set install once; pip's wheel cache is shared across every install. Sets with
+    ranges or local paths are first resolved to exact versions, so the cache never freezes a range.
+    """
+    requirements = resolve_requirements(source_dir, dependency_manager)
+    if not requirements:
+        return None
+    constraints = {line: hash_tree(line[3:]) for line in requirements if line.startswith("-c ")}
+    if not all(PINNED_REQUIREMENT.fullmatch(line) or INDEX_OPTION.match(line) or line in constraints
+               for line in requirements):
+        requirements = _pin_requirements(requirements, source_dir)
+    platform = f"{sysconfig.get_platform()}-{sys.implementation.cache_tag}"
+    key = hash_spec(sorted(requirements), constraints, runtime, platform)
+    site_dir = user_cache_dir("site-packages", key)
+    with _lock(key), _file_lock(site_dir.with_name(f"{key}.lock")):
+        if site_dir.exists():
+            logger.debug(f"Reusing installed dependencies {key} for {source_dir}")
+            return site_dir
+        temp_dir = site_dir.with_name(f"{key}.{os.getpid()}.tmp")
+        requirements_file = site_dir.with_name(f"{key}.{os.getpid()}.txt")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        with open(requirements_file, "w") as f:
+            f.write("\n".join(requirements) + "\n")
+        try:
+            with tracer.span("install_dependencies", "lambda", source_dir=source_dir, requirements=len(requirements)):
+                subprocess.check_call([
+                    sys.executable, "-m", "pip", "install", "-r", str(requirements_file), "--target", str(temp_dir),
+                    "--cache-dir", str(user_cache_dir("pip")), "--disable-pip-version-check"
+                ], cwd=source_dir)
+            os.replace(temp_dir, site_dir)
+        finally:
+            requirements_file.unlink(missing_ok=True)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return site_dir
+
 class Packager:
-    def __init__(self, s3_client, bucket_name, resource_name):
+    def __init__(self, s3_client, bucket_name, resource_name, runtime=None, prebuilt=None):
         self.s3_client = s3_client
         self.bucket_name = bucket_name
         self.resource_name = resource_name
-        self.temp_dir = tempfile.mkdtemp(prefix=f"packager-{resource_name}-")
-
-    def __del__(self):
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-
-    def package_lambda(self, source_dir, output_zip, dependency_manager="pip"):
-        code_dir = os.path.join(self.temp_dir, "code")
-        os.makedirs(code_dir)
-        for item in os.listdir(source_dir):
-            src_path = os.path.join(source_dir, item)
-            dst_path = os.path.join(code_dir, item)
-            if os.path.isdir(src_path):
-                shutil.copytree(src_path, dst_path)
-            else:
-                shutil.copy2(src_path, dst_path)
-        if dependency_manager == "pip" and os.path.exists(os.path.join(source_dir, "requirements.txt")):
-            subprocess.check_call([
-                "pip", "install", "-r", os.path.join(source_dir, "requirements.txt"),
-                "--target", code_dir, "--upgrade"
-            ])
-        elif dependency_manager == "poetry" and os.path.exists(os.path.join(source_dir, "pyproject.toml")):
-            self._install_poetry_deps(source_dir, code_dir)
-        with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(code_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, code_dir)
-                    zipf.write(file_path, arcname)
+        self.runtime = runtime
+        # Futures of build_artifact started ahead of the deploy, by (kind, source_dir, dependency_manager)
+        self.prebuilt = prebuilt if prebuilt is not None else {}
+        # head_object results by S3 key, so a diff and the apply that follows share one call
+        self._heads = {}
+        # Prebuilt futures whose worker spans are already merged into the tracer
+        self._traced = set()
+        # artifact_key results, so a diff and the apply that follows hash the sources once
+        self._keys = {}
+
+    def package_lambda(self, source_dir, output_zip, dependency_manager="pip", include=None, exclude=None):
+        with tracer.span("package_lambda", "lambda", resource=self.resource_name, source_dir=source_dir):
+            files = collect_files(source_dir, include=include, exclude=DEFAULT_EXCLUDES + list(exclude or []))
+            site_dir = site_packages(source_dir, dependency_manager, self.runtime)
+            if site_dir:
+                # Installed packages win over same-named source files, as with pip install --target
+                files += collect_files(site_dir)
+            write_zip(output_zip, files)
 
     def package_layer(self, source_dir, output_zip, dependency_manager="pip"):
-        layer_dir = os.path.join(self.temp_dir, "python")
-        os.makedirs(layer_dir)
-        if dependency_manager == "pip" and os.path.exists(os.path.join(source_dir, "requirements.txt")):
-            subprocess.check_call([
-                "pip", "install", "-r", os.path.join(source_dir, "requirements.txt"),
-                "--target", layer_dir, "--upgrade"
-            ])
-        elif dependency_manager == "poetry" and os.path.exists(os.path.join(source_dir, "pyproject.toml")):
-            self._install_poetry_deps(source_dir, layer_dir)
-        with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(self.temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, self.temp_dir)
-                    zipf.write(file_path, arcname)
-
-    def _install_poetry_deps(self, source_dir, target_dir):
-        poetry = Factory().create_poetry(source_dir)
-        dependencies = poetry.package.dependencies
-        for dep in dependencies:
-            if not dep.is_optional() and not dep.is_vcs():
-                subprocess.check_call([
-                    "pip", "install", f"{dep.name}{dep.constraint}", "--target", target_dir, "--upgrade"
-                ])
+        with tracer.span("package_layer", "lambda", resource=self.resource_name, source_dir=source_dir):
+            site_dir = site_packages(source_dir, dependency_manager, self.runtime)
+            write_zip(output_zip, collect_files(site_dir, prefix="python/") if site_dir else [])
+
+    def artifact(self, kind, source_dir, dependency_manager="pip", include=None, exclude=None):
+        """Upload a function or layer zip under its content key and return (s3_key, code_sha256).
+
+        When the bucket already holds the key, nothing is built or uploaded.
+        """
+        key = self.key(kind, source_dir, dependency_manager, include, exclude)
+        s3_key = f"{ARTIFACT_PREFIXES[kind]}/{key}.zip"
+        uploaded = self._uploaded_sha256(s3_key)
+        if uploaded:
+            logger.info(f"Artifact for {self.resource_name} ({source_dir}) is already in s3://{self.bucket_name}/{s3_key}")
+            return s3_key, uploaded
+        built = self._build(key, kind, source_dir, dependency_manager, include, exclude)
+        metadata = {"code-sha256": built.code_sha256, "content-key": built.key}
+        self.upload_to_s3(built.path, s3_key, metadata)
+        self._heads[s3_key] = {"Metadata": metadata}
+        return s3_key, built.code_sha256
+
+    def code_sha256(self, kind, source_dir, dependency_manager="pip", include=None, exclude=None):
+        """Base64 SHA-256 of an artifact's zip, from the bucket's metadata or a local build; nothing is uploaded."""
+        key = self.key(kind, source_dir, dependency_manager, include, exclude)
+        if self.bucket_name and not is_unresolved(self.bucket_name):
+            uploaded = self._uploaded_sha256(f"{ARTIFACT_PREFIXES[kind]}/{key}.zip")
+            if uploaded:
+                return uploaded
+        return self._build(key, kind, source_dir, dependency_manager, include, exclude).code_sha256
+
+    def key(self, kind, source_dir, dependency_manager="pip", include=None, exclude=None):
+        """The artifact_key for this packager's runtime, computed once per set of arguments."""
+        memo_key = (kind, source_dir, dependency_manager, tuple(include or []), tuple(exclude or []))
+        if memo_key not in self._keys:
+            self._keys[memo_key] = artifact_key(kind, source_dir, dependency_manager, self.runtime, include, exclude)
+        return self._keys[memo_key]
+
+    def _build(self, key, kind, source_dir, dependency_manager, include=None, exclude=None):
+        future = self.prebuilt.get((kind, source_dir, dependency_manager))
+        if future is not None:
+            with tracer.span("await_artifact", "lambda", resource=self.resource_name, source_dir=source_dir):
+                built = future.result()
+            if future not in self._traced:
+                self._traced.add(future)
+                tracer.merge(built.trace)
+            # A source edited since the build started gets rebuilt under its new key
+            if built.key == key:
+                return built
+        return build_artifact(
+            kind, source_dir, dependency_manager, self.runtime, self.resource_name, include, exclude, key=key
+        )
+
+    def object_sha256(self, bucket, s3_key):
+        """Base64 SHA-256 of a zip already in S3, comparable with Lambda's CodeSha256.
+
+        Taken from the object's code-sha256 metadata or S3 checksum when it has one; otherwise the
+        object is downloaded and hashed once per ETag.
+        """
+        head = self.s3_client.head_object(Bucket=bucket, Key=s3_key, ChecksumMode="ENABLED")
+        if head.get("Metadata", {}).get("code-sha256"):
+            return head["Metadata"]["code-sha256"]
+        # Multipart uploads carry a composite "<hash>-<parts>" checksum, which is not the object's hash
+        checksum = head.get("ChecksumSHA256")
+        if checksum and "-" not in checksum:
+            return checksum
+        cache_path = user_cache_dir("s3-sha256", hash_spec(bucket, s3_key, head.get("ETag")))
+        if cache_path.exists():
+            return cache_path.read_text()
+        with tracer.span("hash_s3_object", "lambda", resource=self.resource_name, key=s3_key):
+            body = self.s3_client.get_object(Bucket=bucket, Key=s3_key)["Body"]
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: body.read(1024 * 1024), b""):
+                digest.update(chunk)
+        code_sha256 = base64.b64encode(digest.digest()).decode("ascii")
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(code_sha256)
+        return code_sha256
+
+    def _uploaded_sha256(self, s3_key):
+        if s3_key not in self._heads:
+            self._heads[s3_key] = self._head(s3_key)
+        existing = self._heads[s3_key]
+        return existing.get("Metadata", {}).get("code-sha256") if existing else None
+
+    def _head(self, s3_key):
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
 
-    def upload_to_s3(self, zip_path, s3_key_prefix):
-        unique_key = f"{s3_key_prefix}/{self.resource_name}/{uuid.uuid4()}.zip"
-        self.s3_client.upload_file(zip_path, self.bucket_name, unique_key)
-        return unique_key
+    def upload_to_s3(self, zip_path, s3_key, metadata=None):
+        with tracer.span("upload_to_s3", "lambda", resource=self.resource_name):
+            extra_args = {"Metadata": metadata} if metadata else None
+            self.s3_client.upload_file(zip_path, self.bucket_name, s3_key, ExtraArgs=extra_args)
+            return s3_key
@@ -1,4 +1,5 @@
 from ....core.base_resource import BaseResource
+from ....core.diff import canonical_json
 import json
 import logging
 import re
@@ -8,6 +9,8 @@ logger = logging.getLogger(__name__)
 class S3Bucket(BaseResource):
     resource_type = "s3_bucket"
     platform = "aws"
+    managed_fields = ["versioning", "encryption", "policy", "tags"]
+    self_output_fields = ["arn"]
 
     @classmethod
     def get_schema(cls):
@@ -72,13 +75,15 @@ class S3Bucket(BaseResource):
         self.outputs = self.get_outputs()
 
     def update(self, existing_properties):
-        if self.properties.get("versioning") != existing_properties.get("versioning"):
+        self.self_outputs = {"arn": existing_properties["arn"]}
+        changed = self.changed_fields(existing_properties)
+        if "versioning" in changed:
             status = "Enabled" if self.properties.get("versioning") else "Suspended"
             self.client.put_bucket_versioning(
                 Bucket=self.properties["bucket_name"],
                 VersioningConfiguration={"Status": status}
             )
-        if self.properties.get("encryption", {}).get("kms_key_id") != existing_properties.get("encryption", {}).get("kms_key_id"):
+        if "encryption" in changed and self.properties.get("encryption", {}).get("kms_key_id"):
             self.client.put_bucket_encryption(
                 Bucket=self.properties["bucket_name"],
                 ServerSideEncryptionConfiguration={
@@ -92,8 +97,7 @@ class S3Bucket(BaseResource):
                     ]
                 }
             )
-        self.self_outputs = {"arn": existing_properties["arn"]}
-        if self.properties.get("policy") != existing_properties.get("policy"):
+        if "policy" in changed:
             policy = self._replace_self_references(self.properties["policy"])
             if policy:
                 if isinstance(policy, dict):
@@ -104,13 +108,29 @@ class S3Bucket(BaseResource):
                 )
             else:
                 self.client.delete_bucket_policy(Bucket=self.properties["bucket_name"])
-        if self.tags != existing_properties.get("tags", {}):
+        if "tags" in changed:
             self.client.put_bucket_tagging(
                 Bucket=self.properties["bucket_name"],
                 Tagging={"TagSet": [{"Key": k, "Value": v} for k, v in self.tags.items()]}
             )
         self.outputs = self.get_outputs()
 
+    def desired_value(self, field):
+        if field == "policy":
+            return self._replace_self_references(self.properties.get("policy"))
+        return super().desired_value(field)
+
+    def normalize(self, field, value):
+        if field == "versioning":
+            return bool(value)
+        if field == "encryption":
+            # Desired encryption is {kms_key_id}; observed is the ApplyServerSideEncryptionByDefault rule
+            value = value or {}
+            return value.get("kms_key_id", value.get("KMSMasterKeyID"))
+        if field == "policy":
+            return canonical_json(value)
+        return super().normalize(field, value)
+
     def _replace_self_references(self, policy):
         """Replace ${self.<field>} in policy with self_outputs"""
         def recursive_replace(obj):
@@ -23,6 +23,9 @@ class S3Upload(BaseResource):
             }
         }
 
+    def source_paths(self):
+        return [self.properties["source_path"]]
+
     def exists(self):
         source_path = self.properties["source_path"]
         bucket_name = self.properties["bucket_name"]
@@ -1,4 +1,5 @@
 from ....core.base_resource import BaseResource
+from ....core.inventory import paginate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -6,6 +7,7 @@ logger = logging.getLogger(__name__)
 class SQSQueue(BaseResource):
     resource_type = "sqs_queue"
     platform = "aws"
+    managed_fields = ["delay_seconds", "retention_period", "visibility_timeout", "tags"]
 
     @classmethod
     def get_schema(cls):
@@ -22,9 +24,17 @@ class SQSQueue(BaseResource):
             }
         }
 
+    @classmethod
+    def list_inventory(cls, client):
+        # ListQueues only returns NextToken when MaxResults is sent, so without a page size it stops at 1000
+        queue_urls = paginate(client, "list_queues", "QueueUrls", PaginationConfig={"PageSize": 1000})
+        return {url.rsplit("/", 1)[-1]: url for url in queue_urls}
+
     def exists(self):
+        if self.inventory is not None:
+            return self.properties["queue_name"] in self.inventory
         try:
-            self.client.get_queue_attributes(QueueUrl=self._get_queue_url())
+            self._get_queue_url()
             return True
         except self.client.exceptions.QueueDoesNotExist:
             return False
@@ -40,26 +50,44 @@ class SQSQueue(BaseResource):
             Attributes=attributes,
             tags=self.tags
         )
+        self.invalidate()
+        self.observe("queue_url", lambda: response["QueueUrl"])
         self.outputs = self.get_outputs()
 
     def update(self, existing_properties):
         queue_url = self._get_queue_url()
-        attributes = {}
-        if self.properties.get("delay_seconds", 0) != existing_properties.get("delay_seconds"):
-            attributes["DelaySeconds"] = str(self.properties["delay_seconds"])
-        if self.properties.get("retention_period", 345600) != existing_properties.get("retention_period"):
-            attributes["MessageRetentionPeriod"] = str(self.properties["retention_period"])
-        if self.properties.get("visibility_timeout", 30) != existing_properties.get("visibility_timeout"):
-            attributes["VisibilityTimeout"] = str(self.properties["visibility_timeout"])
+        changed = self.changed_fields(existing_properties)
+        attribute_names = {
+            "delay_seconds": "DelaySeconds",
+            "retention_period": "MessageRetentionPeriod",
+            "visibility_timeout": "VisibilityTimeout"
+        }
+        attributes = {
+            attribute: str(self.desired_value(field))
+            for field, attribute in attribute_names.items() if field in changed
+        }
         if attributes:
             self.client.set_queue_attributes(QueueUrl=queue_url, Attributes=attributes)
-        if self.tags != existing_properties.get("tags", {}):
+        if "tags" in changed:
+            removed = [key for key in existing_properties.get("tags") or {} if key not in self.tags]
+            if removed:
+                self.client.untag_queue(QueueUrl=queue_url, TagKeys=removed)
             self.client.tag_queue(QueueUrl=queue_url, Tags=self.tags)
+        self.invalidate("attributes", "tags")
         self.outputs = self.get_outputs()
 
+    def normalize(self, field, value):
+        if field in ("delay_seconds", "retention_period", "visibility_timeout") and value is not None:
+            return int(value)
+        return super().normalize(field, value)
+
     def _get_queue_url(self):
-        response = self.client.get_queue_url(QueueName=self.properties["queue_name"])
-        return response["QueueUrl"]
+        if self.inventory and self.properties["queue_name"] in self.inventory:
+            return self.inventory[self.properties["queue_name"]]
+        return self.observe(
+            "queue_url",
+            lambda: self.client.get_queue_url(QueueName=self.properties["queue_name"])["QueueUrl"]
+        )
 
     def get_outputs(self):
         return {
@@ -72,8 +100,11 @@ class SQSQueue(BaseResource):
 
     def get_existing_properties(self):
         queue_url = self._get_queue_url()
-        attributes = self.client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["All"])["Attributes"]
-        tags = self.client.list_queue_tags(QueueUrl=queue_url).get("Tags", {})
+        attributes = self.observe(
+            "attributes",
+            lambda: self.client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["All"])["Attributes"]
+        )
+        tags = self.observe("tags", lambda: self.client.list_queue_tags(QueueUrl=queue_url).get("Tags", {}))
         return {
             "delay_seconds": int(attributes.get("DelaySeconds", 0)),
             "retention_period": int(attributes.get("MessageRetentionPeriod", 345600)),
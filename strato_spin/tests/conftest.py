@@ -0,0 +1,6 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # Plugin manifests and build caches go under the user cache; keep tests out of it
+    monkeypatch.setenv("STRATO_SPIN_CACHE_DIR", str(tmp_path / "cache"))
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta, timezone
+from strato_spin.core import assume_role
+
+def test_chain_assume_role_reuses_refreshable_session(monkeypatch):
+    calls = []
+
+    def fake_assume_chain(role_chain, region):
+        calls.append(region)
+        return None, {
+            "AccessKeyId": "AKIA",
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": datetime.now(timezone.utc) + timedelta(hours=1)
+        }, "123456789012"
+
+    monkeypatch.setattr(assume_role, "_assume_chain", fake_assume_chain)
+    assume_role.clear_session_cache()
+    role_chain = [{"role_arn": "arn:aws:iam::123456789012:role/deploy", "session_name": "deploy"}]
+    first = assume_role.chain_assume_role(role_chain, region="ap-southeast-2")
+    second = assume_role.chain_assume_role(role_chain, region="ap-southeast-2")
+    assert first is second
+    assert calls == ["ap-southeast-2"]
+    assert first.get_credentials().access_key == "AKIA"
+    assert assume_role.get_account_id(role_chain, region="ap-southeast-2") == "123456789012"
+    assume_role.clear_session_cache()
@@ -0,0 +1,57 @@
+from strato_spin.resources.aws.sqs_queue.sqs_queue import SQSQueue
+
+class FakeSQSClient:
+    class exceptions:
+        class QueueDoesNotExist(Exception):
+            pass
+
+    class meta:
+        region_name = "ap-southeast-2"
+        account_id = "123456789012"
+
+    def __init__(self):
+        self.calls = []
+
+    def get_queue_url(self, QueueName):
+        self.calls.append("get_queue_url")
+        return {"QueueUrl": f"https://sqs/{QueueName}"}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames):
+        self.calls.append("get_queue_attributes")
+        return {"Attributes": {}}
+
+    def list_queue_tags(self, QueueUrl):
+        self.calls.append("list_queue_tags")
+        return {"Tags": {}}
+
+def test_observation_cache_collapses_repeated_describe_calls():
+    client = FakeSQSClient()
+    queue = SQSQueue("queue", {"queue_name": "jobs"}, {"Environment": "test", "Owner": "me"},
+                     SQSQueue.get_schema(), client)
+    assert queue.exists()
+    queue.get_existing_properties()
+    queue.get_outputs()
+    queue.get_outputs()
+    assert client.calls == ["get_queue_url", "get_queue_attributes", "list_queue_tags"]
+    queue.invalidate()
+    queue.get_outputs()
+    assert client.calls.count("get_queue_url") == 2
+
+def test_sqs_update_removes_tags_missing_from_the_spec():
+    class TaggedClient(FakeSQSClient):
+        def list_queue_tags(self, QueueUrl):
+            return {"Tags": {"Environment": "test", "Owner": "me", "Stale": "yes"}}
+
+        def untag_queue(self, QueueUrl, TagKeys):
+            self.calls.append(("untag_queue", TagKeys))
+
+        def tag_queue(self, QueueUrl, Tags):
+            self.calls.append(("tag_queue", Tags))
+
+    client = TaggedClient()
+    queue = SQSQueue("queue", {"queue_name": "jobs"}, {"Environment": "test", "Owner": "me"},
+                     SQSQueue.get_schema(), client)
+    existing = queue.get_existing_properties()
+    assert list(queue.diff(existing)) == ["tags.Stale"]
+    queue.update(existing)
+    assert ("untag_queue", ["Stale"]) in client.calls
@@ -0,0 +1,17 @@
+from click.testing import CliRunner
+from strato_spin import cli as cli_module
+
+class FakeDeployer:
+    def plan(self):
+        return [
+            {"name": "queue", "platform": "aws", "type": "sqs_queue", "action": "no-op", "changes": {}},
+            {"name": "table", "platform": "aws", "type": "dynamodb_table", "action": "error", "changes": {},
+             "error": "AccessDenied"}
+        ]
+
+def test_plan_reports_errored_resources_and_fails(monkeypatch):
+    monkeypatch.setattr(cli_module, "make_deployer", lambda **options: FakeDeployer())
+    result = CliRunner().invoke(cli_module.cli, ["plan", "--infra", "infra.yaml"])
+    assert result.exit_code == 1
+    assert "0 to create, 0 to update, 1 unchanged, 1 errored" in result.output
+    assert "Could not observe: table" in result.output
@@ -0,0 +1,15 @@
+import boto3
+from strato_spin.core.clients import ClientFactory, build_client_config
+
+def test_client_factory_shares_clients_per_session():
+    ClientFactory.clear()
+    session = boto3.Session(aws_access_key_id="a", aws_secret_access_key="b", region_name="ap-southeast-2")
+    config = build_client_config({"max_pool_connections": 50})
+    first = ClientFactory.get_client("aws", "s3", session, config=config, account_id="123456789012")
+    second = ClientFactory.get_client("aws", "s3", session, config=config, account_id="123456789012")
+    other = ClientFactory.get_client("aws", "sqs", session, config=config, account_id="123456789012")
+    assert first is second
+    assert first is not other
+    assert first.meta.account_id == "123456789012"
+    assert first.meta.config.max_pool_connections == 50
+    ClientFactory.clear()
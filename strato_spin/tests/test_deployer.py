@@ -1,5 +1,54 @@
 import pytest
+from strato_spin.core.base_resource import BaseResource
+from strato_spin.core import deployer as deployer_module
 from strato_spin.core.deployer import Deployer
+from strato_spin.core.waiter import Pending
+
+class FakeResource(BaseResource):
+    resource_type = "fake"
+    platform = "aws"
+    required_tags = []
+    calls = []
+
+    @classmethod
+    def get_schema(cls):
+        return {"required": [], "optional": {}, "tags": {"required": []}}
+
+    def exists(self):
+        self.calls.append(("exists", self.name))
+        return False
+
+    def create(self):
+        self.calls.append(("create", self.name))
+        return Pending(f"{self.name} to settle", lambda: self.calls.append(("check", self.name)) or True, interval=0)
+
+    def update(self, existing_properties):
+        self.calls.append(("update", self.name))
+
+    def get_outputs(self):
+        return {"properties": {"id": f"{self.name}-id"}}
+
+def make_deployer(tmpdir, infra, **kwargs):
+    infra_file = tmpdir / "infra.yaml"
+    infra_file.write(infra)
+    deployer = Deployer(str(infra_file), state_dir=str(tmpdir / "state"), **kwargs)
+    deployer.plugin_registry.resource_types["aws"]["fake"] = FakeResource
+    deployer.plugin_registry.schemas["aws"]["fake"] = FakeResource.get_schema()
+    deployer.get_client = lambda platform, resource_type: None
+    return deployer
+
+FAKE_INFRA = """
+resources:
+  - type: fake
+    name: first
+    properties: {}
+    tags: {}
+  - type: fake
+    name: second
+    properties:
+      upstream: ${resources.first.properties.id}
+    tags: {}
+"""
 
 def test_deployer_initialization(tmpdir):
     infra_file = tmpdir / "infra.yaml"
@@ -9,3 +58,193 @@ resources: []
 """)
     deployer = Deployer(str(infra_file), flavour="test")
     assert deployer.parser.flavour == "test"
+
+def test_deployer_client_config_cli_overrides_infra(tmpdir):
+    infra_file = tmpdir / "infra.yaml"
+    infra_file.write("""
+client_config:
+  max_pool_connections: 20
+  max_attempts: 5
+resources: []
+""")
+    deployer = Deployer(str(infra_file), client_config={"max_pool_connections": 64, "max_attempts": None})
+    assert deployer.client_config.max_pool_connections == 64
+    assert deployer.client_config.retries == {"max_attempts": 5, "mode": "standard"}
+
+def test_deployer_skips_resources_recorded_in_state(tmpdir):
+    FakeResource.calls.clear()
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert ("create", "second") in FakeResource.calls
+
+    FakeResource.calls.clear()
+    deployer = make_deployer(tmpdir, FAKE_INFRA)
+    assert deployer.deploy()
+    assert FakeResource.calls == []
+    assert deployer.resource_outputs["first"] == {"properties": {"id": "first-id"}}
+
+    FakeResource.calls.clear()
+    assert make_deployer(tmpdir, FAKE_INFRA, refresh=True).deploy()
+    assert ("exists", "first") in FakeResource.calls
+
+def test_deployer_plan_observes_without_writing(tmpdir):
+    FakeResource.calls.clear()
+    entries = make_deployer(tmpdir, FAKE_INFRA).plan()
+    assert [(e["name"], e["action"]) for e in entries] == [("first", "create"), ("second", "create")]
+    assert sorted(FakeResource.calls) == [("exists", "first"), ("exists", "second")]
+
+def test_deployer_concurrency_cli_overrides_infra(tmpdir):
+    infra_file = tmpdir / "infra.yaml"
+    infra_file.write("""
+concurrency:
+  max_workers: 8
+  types:
+    lambda_function: 2
+    s3_upload: 16
+resources: []
+""")
+    deployer = Deployer(str(infra_file), concurrency={"max_workers": None, "types": {"lambda_function": 1}})
+    assert deployer.concurrency == {
+        "max_workers": 8,
+        "max_in_flight": 256,
+        "build_workers": None,
+        "platforms": {},
+        "types": {"lambda_function": 1, "s3_upload": 16}
+    }
+
+def test_deployer_asyncio_engine_waits_on_pending_and_respects_dependencies(tmpdir):
+    FakeResource.calls.clear()
+    deployer = make_deployer(tmpdir, FAKE_INFRA)
+    assert deployer.deploy(engine="asyncio")
+    assert FakeResource.calls.index(("check", "first")) < FakeResource.calls.index(("exists", "second"))
+    assert deployer.resource_outputs["second"] == {"properties": {"id": "second-id"}}
+    assert deployer.state.get("second")["outputs"] == {"properties": {"id": "second-id"}}
+
+def test_deployer_target_selects_dependency_closure(tmpdir):
+    FakeResource.calls.clear()
+    deployer = make_deployer(tmpdir, FAKE_INFRA, targets=["fir*"])
+    assert deployer.deploy()
+    assert [resource.name for resource in deployer.resources] == ["first"]
+    assert make_deployer(tmpdir, FAKE_INFRA, targets=["second"]).select_resources() == {"first", "second"}
+    with pytest.raises(ValueError):
+        make_deployer(tmpdir, FAKE_INFRA, targets=["missing-*"]).select_resources()
+
+def test_deployer_no_deps_reads_upstream_outputs_from_state(tmpdir):
+    with pytest.raises(ValueError):
+        make_deployer(tmpdir, FAKE_INFRA, targets=["second"], no_deps=True).deploy()
+    assert make_deployer(tmpdir, FAKE_INFRA, targets=["first"]).deploy()
+    FakeResource.calls.clear()
+    deployer = make_deployer(tmpdir, FAKE_INFRA, targets=["second"], no_deps=True)
+    assert deployer.deploy()
+    assert [resource.name for resource in deployer.resources] == ["second"]
+    assert deployer.resources[0].properties["upstream"] == "first-id"
+    assert ("exists", "first") not in FakeResource.calls
+
+def test_deployer_fingerprint_covers_sources_and_plugin_version(tmpdir, monkeypatch):
+    source = tmpdir / "src"
+    source.mkdir()
+    (source / "handler.py").write("def handler(event, context): pass\n")
+    monkeypatch.setattr(FakeResource, "source_paths", lambda self: [str(source)])
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+
+    FakeResource.calls.clear()
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert FakeResource.calls == []
+
+    (source / "handler.py").write("def handler(event, context): return 1\n")
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert ("exists", "first") in FakeResource.calls
+
+    FakeResource.calls.clear()
+    monkeypatch.setattr(FakeResource, "version", 2)
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert ("exists", "first") in FakeResource.calls
+
+def test_deployer_prebuilds_only_resources_it_will_apply(tmpdir, monkeypatch):
+    source = tmpdir / "src"
+    source.mkdir()
+    (source / "handler.py").write("def handler(event, context): pass\n")
+    monkeypatch.setattr(FakeResource, "source_paths", lambda self: [str(source)] if self.name == "first" else [])
+    prebuilt = []
+    monkeypatch.setattr(FakeResource, "prebuild", lambda self, executor: prebuilt.append(self.name))
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert sorted(prebuilt) == ["first", "second"]
+
+    prebuilt.clear()
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert prebuilt == []
+
+    (source / "handler.py").write("def handler(event, context): return 1\n")
+    hashed = []
+    original_hash_tree = deployer_module.hash_tree
+    monkeypatch.setattr(deployer_module, "hash_tree", lambda path: hashed.append(path) or original_hash_tree(path))
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert prebuilt == ["first"]
+    assert hashed == [str(source)]
+
+def test_deployer_updates_plugins_without_managed_fields(tmpdir, monkeypatch):
+    monkeypatch.setattr(FakeResource, "exists", lambda self: True)
+    FakeResource.calls.clear()
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    assert sorted(FakeResource.calls) == [("update", "first"), ("update", "second")]
+
+    monkeypatch.setattr(FakeResource, "get_existing_properties", lambda self: {"tags": {}, "upstream": "first-id"})
+    entries = make_deployer(tmpdir, FAKE_INFRA).plan()
+    assert [(e["name"], e["action"]) for e in entries] == [("first", "no-op"), ("second", "no-op")]
+
+def test_state_store_batches_writes_until_flush(tmpdir):
+    from strato_spin.core.state import StateStore
+    state = StateStore(str(tmpdir / "state.json"))
+    for name in ("first", "second"):
+        state.record(name, "hash", {}, {"properties": {}})
+    assert not (tmpdir / "state.json").exists()
+    state.flush()
+    assert sorted(StateStore(str(tmpdir / "state.json")).resources) == ["first", "second"]
+
+def test_deployer_refresh_after_reobserves_stale_resources(tmpdir):
+    assert make_deployer(tmpdir, FAKE_INFRA).deploy()
+    FakeResource.calls.clear()
+    assert make_deployer(tmpdir, FAKE_INFRA, refresh_after=3600).deploy()
+    assert FakeResource.calls == []
+    assert make_deployer(tmpdir, FAKE_INFRA, refresh_after=0).deploy()
+    assert ("exists", "first") in FakeResource.calls
+
+def test_deployer_resume_skips_resources_completed_before_failure(tmpdir, monkeypatch):
+    original_create = FakeResource.create
+
+    def failing_create(self):
+        if self.name == "second":
+            raise RuntimeError("boom")
+        return original_create(self)
+
+    monkeypatch.setattr(FakeResource, "create", failing_create)
+    assert not make_deployer(tmpdir, FAKE_INFRA, refresh=True).deploy()
+    checkpoint = make_deployer(tmpdir, FAKE_INFRA).journal.load()
+    assert list(checkpoint["completed"]) == ["first"]
+    assert "second" in checkpoint["failed"]
+
+    monkeypatch.setattr(FakeResource, "create", original_create)
+    FakeResource.calls.clear()
+    deployer = make_deployer(tmpdir, FAKE_INFRA, refresh=True)
+    assert deployer.deploy(resume=True)
+    assert ("exists", "first") not in FakeResource.calls
+    assert ("create", "second") in FakeResource.calls
+    assert deployer.resources[1].properties["upstream"] == "first-id"
+    assert deployer.journal.load()["succeeded"]
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_deployer_journals_failed_waits_and_runs_follow_ups(tmpdir, monkeypatch, engine):
+    def create(self):
+        self.calls.append(("create", self.name))
+        if self.name == "first":
+            return Pending("first to fail", lambda: 1 / 0, interval=0)
+        follow_up = Pending("follow-up", lambda: True, then=lambda: self.calls.append(("then", self.name)))
+        return Pending("second to settle", lambda: True, then=lambda: follow_up, interval=0)
+
+    monkeypatch.setattr(FakeResource, "create", create)
+    FakeResource.calls.clear()
+    deployer = make_deployer(tmpdir, FAKE_INFRA.replace("${resources.first.properties.id}", "static"))
+    assert not deployer.deploy(fail_fast=False, engine=engine)
+    checkpoint = deployer.journal.load()
+    assert "division by zero" in checkpoint["failed"]["first"]
+    assert list(checkpoint["completed"]) == ["second"]
+    assert ("then", "second") in FakeResource.calls
@@ -0,0 +1,27 @@
+from strato_spin.core.diff import canonical_json, diff_fields, UNKNOWN
+from strato_spin.resources.aws.sqs_queue.sqs_queue import SQSQueue
+
+def test_canonical_json_ignores_key_order():
+    assert canonical_json('{"b": 1, "a": [1, 2]}') == canonical_json({"a": [1, 2], "b": 1})
+
+def test_diff_fields_reports_nested_and_unknown_values():
+    changes = diff_fields(
+        {"environment": {"A": "1", "B": "${resources.queue.properties.url}"}, "timeout": 30},
+        {"environment": {"A": "2"}, "timeout": 30}
+    )
+    assert changes == {
+        "environment.A": {"before": "2", "after": "1"},
+        "environment.B": {"before": None, "after": UNKNOWN}
+    }
+
+def test_resource_diff_applies_schema_defaults_and_tag_normalisation():
+    queue = SQSQueue(
+        "queue", {"queue_name": "jobs", "visibility_timeout": "60"},
+        {"Environment": "dev", "Owner": 7}, SQSQueue.get_schema(), None
+    )
+    existing = {
+        "delay_seconds": 0, "retention_period": 345600, "visibility_timeout": 60,
+        "tags": {"Owner": "7", "Environment": "dev"}
+    }
+    assert queue.diff(existing) == {}
+    assert queue.changed_fields({**existing, "delay_seconds": 5}) == {"delay_seconds"}
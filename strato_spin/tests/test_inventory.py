@@ -0,0 +1,46 @@
+from strato_spin.core.inventory import Inventory
+from strato_spin.resources.aws.kms_key.kms_key import KMSKey
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+class FakeKMSClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_paginator(self, operation):
+        assert operation == "list_aliases"
+        self.calls += 1
+        return FakePaginator([
+            {"Aliases": [{"AliasName": "alias/one", "TargetKeyId": "key-1"}]},
+            {"Aliases": [{"AliasName": "alias/two", "TargetKeyId": "key-2"}]}
+        ])
+
+def make_key(name, alias, client):
+    return KMSKey(name, {"alias": alias}, {"Environment": "test", "Owner": "me"}, KMSKey.get_schema(), client)
+
+def test_inventory_lists_once_per_client_and_paginates():
+    client = FakeKMSClient()
+    keys = [make_key("one", "alias/one", client), make_key("two", "alias/two", client),
+            make_key("three", "alias/three", client)]
+    Inventory().prefetch(keys)
+    assert client.calls == 1
+    assert [key.exists() for key in keys] == [True, True, False]
+    assert keys[1]._find_key_id() == "key-2"
+    assert client.calls == 1
+
+def test_sqs_inventory_requests_every_page():
+    import boto3
+    from botocore.stub import Stubber
+    from strato_spin.resources.aws.sqs_queue.sqs_queue import SQSQueue
+    client = boto3.client("sqs", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="x")
+    url = "https://sqs.us-east-1.amazonaws.com/123456789012/"
+    with Stubber(client) as stubber:
+        stubber.add_response("list_queues", {"QueueUrls": [url + "first"], "NextToken": "page-2"}, {"MaxResults": 1000})
+        stubber.add_response("list_queues", {"QueueUrls": [url + "second"]}, {"MaxResults": 1000, "NextToken": "page-2"})
+        assert SQSQueue.list_inventory(client) == {"first": url + "first", "second": url + "second"}
+        stubber.assert_no_pending_responses()
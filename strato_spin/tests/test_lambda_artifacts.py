@@ -0,0 +1,284 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import zipfile
+from botocore.exceptions import ClientError
+from strato_spin.core.tracing import tracer
+from strato_spin.resources.aws.lambda_func import packager as packager_module
+from strato_spin.resources.aws.lambda_func.packager import (
+    Packager, artifact_key, build_artifact, resolve_requirements, site_packages
+)
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+        self.bodies = {}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"Metadata": self.objects[Key], "ETag": f'"{Key}"'}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.bodies[Key])}
+
+    def upload_file(self, path, bucket, key, ExtraArgs=None):
+        self.uploads.append(key)
+        self.objects[key] = (ExtraArgs or {}).get("Metadata", {})
+
+def make_source(tmpdir):
+    source = tmpdir.mkdir("src")
+    (source / "handler.py").write("def handler(event, context):\n    return 1\n")
+    return str(source)
+
+def test_build_artifact_is_cached_by_content_key(tmpdir, monkeypatch):
+    source = make_source(tmpdir)
+    first = build_artifact("function", source, runtime="python3.11")
+    assert first.key == artifact_key("function", source, runtime="python3.11")
+    monkeypatch.setattr(Packager, "package_lambda", lambda *args: 1 / 0)
+    assert build_artifact("function", source, runtime="python3.11") == first
+    assert artifact_key("function", source, runtime="python3.12") != first.key
+
+def test_packager_hashes_sources_once_across_diff_and_upload(tmpdir, monkeypatch):
+    source = make_source(tmpdir)
+    keys = []
+    original_key = packager_module.artifact_key
+    monkeypatch.setattr(packager_module, "artifact_key", lambda *args: keys.append(args) or original_key(*args))
+    packager = Packager(FakeS3(), "bucket", "fn", "python3.11")
+    code_sha256 = packager.code_sha256("function", source)
+    assert packager.artifact("function", source)[1] == code_sha256
+    assert len(keys) == 1
+
+def test_artifact_key_counts_only_shipped_files(tmpdir):
+    source = make_source(tmpdir)
+    (tmpdir / "src" / "notes.md").write("draft\n")
+    (tmpdir / "src" / "requirements.txt").write("-r base.txt\n")
+    (tmpdir / "src" / "base.txt").write("requests==2.31.0\n")
+    function_key = artifact_key("function", source, exclude=["*.md"])
+    layer_key = artifact_key("layer", source)
+
+    (tmpdir / "src" / "notes.md").write("final\n")
+    assert artifact_key("function", source, exclude=["*.md"]) == function_key
+    (tmpdir / "src" / "handler.py").write("def handler(event, context):\n    return 2\n")
+    assert artifact_key("function", source, exclude=["*.md"]) != function_key
+    assert artifact_key("layer", source) == layer_key
+
+    (tmpdir / "src" / "base.txt").write("requests==2.32.0\n")
+    assert artifact_key("layer", source) != layer_key
+
+def test_packager_skips_build_and_upload_when_bucket_has_artifact(tmpdir, monkeypatch):
+    source = make_source(tmpdir)
+    s3 = FakeS3()
+    s3_key, code_sha256 = Packager(s3, "bucket", "fn", "python3.11").artifact("function", source)
+    assert s3.uploads == [s3_key]
+    assert s3.objects[s3_key]["code-sha256"] == code_sha256
+
+    monkeypatch.setattr(packager_module, "build_artifact", lambda *args: 1 / 0)
+    assert Packager(s3, "bucket", "other-fn", "python3.11").artifact("function", source) == (s3_key, code_sha256)
+    assert s3.uploads == [s3_key]
+
+def test_package_lambda_is_reproducible_and_honours_globs(tmpdir):
+    source = tmpdir.mkdir("src")
+    (source / "handler.py").write("def handler(event, context):\n    return 1\n")
+    source.mkdir("__pycache__").join("handler.cpython-312.pyc").write("cached")
+    source.mkdir("tests").join("test_handler.py").write("")
+    packager = Packager(None, None, "fn")
+    packager.package_lambda(str(source), str(tmpdir / "first.zip"), exclude=["tests"])
+    os.utime(str(source / "handler.py"), (0, 0))
+    packager.package_lambda(str(source), str(tmpdir / "second.zip"), exclude=["tests"])
+    assert (tmpdir / "first.zip").read_binary() == (tmpdir / "second.zip").read_binary()
+    archive = zipfile.ZipFile(str(tmpdir / "first.zip"))
+    assert archive.namelist() == ["handler.py"]
+    assert archive.getinfo("handler.py").date_time == (1980, 1, 1, 0, 0, 0)
+
+def test_poetry_lock_resolves_main_dependencies_only(tmpdir):
+    source = tmpdir.mkdir("src")
+    (source / "pyproject.toml").write(
+        '[tool.poetry.dependencies]\npython = "^3.12"\nRequests = "^2.31"\n\n'
+        '[tool.poetry.group.dev.dependencies]\npytest = "^8"\n'
+    )
+    (source / "poetry.lock").write(
+        '[[package]]\nname = "requests"\nversion = "2.31.0"\n\n[package.dependencies]\n'
+        'urllib3 = ">=1.21.1,<3"\nPySocks = {version = "*", optional = true}\n\n'
+        '[[package]]\nname = "urllib3"\nversion = "2.2.1"\n\n'
+        '[[package]]\nname = "pysocks"\nversion = "1.7.1"\n\n'
+        '[[package]]\nname = "pytest"\nversion = "8.1.1"\n'
+    )
+    assert resolve_requirements(str(source), "poetry") == ["requests==2.31.0", "urllib3==2.2.1"]
+
+def test_site_packages_installs_a_shared_dependency_set_once(tmpdir, monkeypatch):
+    installs = []
+
+    def fake_pip(command, cwd=None):
+        target = command[command.index("--target") + 1]
+        os.makedirs(os.path.join(target, "requests"))
+        open(os.path.join(target, "requests", "__init__.py"), "w").close()
+        installs.append(cwd)
+
+    monkeypatch.setattr(packager_module.subprocess, "check_call", fake_pip)
+    sources = []
+    for name in ("one", "two"):
+        source = tmpdir.mkdir(name)
+        (source / "requirements.txt").write("requests==2.31.0\n")
+        sources.append(str(source))
+    first = site_packages(sources[0], runtime="python3.11")
+    assert site_packages(sources[1], runtime="python3.11") == first
+    assert len(installs) == 1
+
+    packager = Packager(None, None, "fn", "python3.11")
+    packager.package_lambda(sources[1], str(tmpdir / "fn.zip"))
+    assert len(installs) == 1
+    assert "requests/__init__.py" in zipfile.ZipFile(str(tmpdir / "fn.zip")).namelist()
+
+def fake_install(installs, report=None):
+    def check_call(command, cwd=None):
+        if "--dry-run" in command:
+            with open(command[command.index("--report") + 1], "w") as f:
+                json.dump({"install": report}, f)
+            return
+        os.makedirs(command[command.index("--target") + 1])
+        with open(command[command.index("-r") + 1]) as f:
+            installs.append(f.read().split())
+    return check_call
+
+def test_site_packages_key_follows_nested_requirement_files(tmpdir, monkeypatch):
+    installs = []
+    monkeypatch.setattr(packager_module.subprocess, "check_call", fake_install(installs))
+    source = tmpdir.mkdir("src")
+    (source / "requirements.txt").write("-r base.txt\n")
+    (source / "base.txt").write("requests==2.31.0\n")
+    first = site_packages(str(source), runtime="python3.11")
+    (source / "base.txt").write("requests==2.32.0\n")
+    assert site_packages(str(source), runtime="python3.11") != first
+    assert installs == [["requests==2.31.0"], ["requests==2.32.0"]]
+
+def test_site_packages_pins_unpinned_requirements_before_keying(tmpdir, monkeypatch):
+    installs = []
+    report = [{"metadata": {"name": "requests", "version": "2.31.0"}, "download_info": {"url": "https://x/requests.whl"}}]
+    monkeypatch.setattr(packager_module.subprocess, "check_call", fake_install(installs, report))
+    source = tmpdir.mkdir("src")
+    (source / "requirements.txt").write("requests>=2\n")
+    first = site_packages(str(source), runtime="python3.11")
+    report[0]["metadata"]["version"] = "2.32.0"
+    assert site_packages(str(source), runtime="python3.11") != first
+    assert installs == [["requests==2.31.0"], ["requests==2.32.0"]]
+
+class FakeLambda:
+    class exceptions:
+        class ResourceNotFoundException(Exception):
+            pass
+
+    def __init__(self, configuration, layer_versions=()):
+        self.configuration = configuration
+        self.layer_versions = list(layer_versions)
+        self.tags = {"Environment": "dev", "Owner": "team"}
+        self.meta = type("Meta", (), {"region_name": "us-east-1", "account_id": "123456789012"})()
+        self.calls = []
+
+    def get_function(self, FunctionName):
+        self.calls.append("get_function")
+        return {"Configuration": self.configuration, "Tags": self.tags}
+
+    def get_paginator(self, operation):
+        self.calls.append(operation)
+        layer_versions = self.layer_versions
+        return type("Paginator", (), {"paginate": lambda self, **kwargs: [{"LayerVersions": layer_versions}]})()
+
+    def __getattr__(self, operation):
+        return lambda **kwargs: self.calls.append(operation) or {"LayerVersionArn": "arn:new-layer"}
+
+def make_function(tmpdir, s3, configuration, layer_versions=()):
+    from strato_spin.resources.aws.lambda_func.lambda_func import LambdaFunction
+    properties = {
+        "function_name": "fn", "runtime": "python3.11", "handler": "handler.handler", "role_arn": "arn:role",
+        "source_dir": make_source(tmpdir), "code_s3_bucket": "bucket", "environment": {}
+    }
+    return LambdaFunction(
+        "fn", properties, {"Environment": "dev", "Owner": "team"}, LambdaFunction.get_schema(),
+        FakeLambda(configuration, layer_versions), {"s3": s3}
+    )
+
+def test_lambda_update_sends_only_changed_parts(tmpdir):
+    s3 = FakeS3()
+    configuration = {
+        "Runtime": "python3.11", "Handler": "handler.handler", "Timeout": 30, "MemorySize": 128, "Role": "arn:role"
+    }
+    function = make_function(tmpdir, s3, configuration)
+    _, configuration["CodeSha256"] = function.packager.artifact("function", function.properties["source_dir"])
+    assert function.diff(function.get_existing_properties()) == {}
+    assert function.client.calls == ["get_function"]
+
+    configuration["CodeSha256"] = "stale"
+    function = make_function(tmpdir.mkdir("changed"), s3, configuration)
+    existing = function.get_existing_properties()
+    assert list(function.diff(existing)) == ["code_sha256"]
+    pending = function.update(existing)
+    assert pending.then() is None
+    assert "update_function_code" in function.client.calls
+    assert "update_function_configuration" not in function.client.calls
+    assert "tag_resource" not in function.client.calls
+
+    function = make_function(tmpdir.mkdir("tagged"), s3, configuration)
+    function.client.tags = {**function.tags, "Stale": "yes"}
+    existing = function.get_existing_properties()
+    assert "tags.Stale" in function.diff(existing)
+    function.update(existing).then()
+    assert ["untag_resource", "tag_resource"] == [c for c in function.client.calls if "tag" in c]
+
+def test_lambda_reuses_layer_published_from_same_content(tmpdir):
+    function = make_function(tmpdir, FakeS3(), {})
+    layer = {"name": "deps", "source_dir": function.properties["source_dir"]}
+    function.client.layer_versions = [
+        {"Version": 1, "LayerVersionArn": "arn:deps:1", "Description": "Layer for fn (old)"},
+        {"Version": 2, "LayerVersionArn": "arn:deps:2", "Description": f"Layer for fn ({function._layer_key(layer)})"}
+    ]
+    function.properties["layers"] = [layer]
+    assert function._publish_layers() == ["arn:deps:2"]
+    assert "publish_layer_version" not in function.client.calls
+
+def test_lambda_prebuild_packages_in_process_pool(tmpdir, monkeypatch):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    s3 = FakeS3()
+    function = make_function(tmpdir, s3, {})
+    function.properties["code_s3_bucket"] = "${resources.bucket.properties.bucket_name}"
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "events", [])
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        function.prebuild(executor)
+        assert list(function._prebuilt) == [("function", function.properties["source_dir"], "pip")]
+        function._prebuilt[("function", function.properties["source_dir"], "pip")].result()
+        monkeypatch.setattr(packager_module, "build_artifact", lambda *args: 1 / 0)
+        function.properties["code_s3_bucket"] = "bucket"
+        location = function._code_location()
+    assert s3.uploads == [location["S3Key"]]
+    worker_spans = [event["name"] for event in tracer.events if event["pid"] != os.getpid()]
+    assert worker_spans == ["package_lambda"]
+
+def test_lambda_updates_code_when_only_the_s3_key_changes(tmpdir):
+    s3 = FakeS3()
+    for key, body in (("code/v1.zip", b"first"), ("code/v2.zip", b"second")):
+        s3.objects[key] = {}
+        s3.bodies[key] = body
+    configuration = {
+        "Runtime": "python3.11", "Handler": "handler.handler", "Timeout": 30, "MemorySize": 128, "Role": "arn:role",
+        "CodeSha256": base64.b64encode(hashlib.sha256(b"first").digest()).decode("ascii")
+    }
+
+    def make_s3_function(key):
+        function = make_function(tmpdir.mkdir(key.replace("/", "-")), s3, configuration)
+        del function.properties["source_dir"]
+        function.properties["code_s3_key"] = key
+        return function
+
+    function = make_s3_function("code/v1.zip")
+    assert function.diff(function.get_existing_properties()) == {}
+
+    function = make_s3_function("code/v2.zip")
+    existing = function.get_existing_properties()
+    assert list(function.diff(existing)) == ["code_sha256"]
+    function.update(existing)
+    assert "update_function_code" in function.client.calls
@@ -0,0 +1,96 @@
+import datetime
+import pytest
+from strato_spin.core.parser import Parser
+from strato_spin.core.state import user_cache_dir
+
+INFRA = """
+variables:
+  region: ap-southeast-2
+resources:
+  - type: sqs_queue
+    name: queue
+    properties:
+      queue_name: jobs
+      region: ${variables.region}
+      flavours:
+        dev:
+          delay_seconds: 5
+    tags:
+      Environment: ${flavour}
+  - type: lambda_function
+    name: worker
+    properties:
+      function_name: worker
+      environment:
+        QUEUE_URL: ${resources.queue.properties.url}
+        ARN: "${self.arn}"
+    tags: {}
+"""
+
+def make_parser(tmpdir):
+    infra_file = tmpdir / "infra.yaml"
+    infra_file.write(INFRA)
+    return Parser(str(infra_file), None, flavour="dev")
+
+def test_resolve_resource_applies_flavour_and_suffix_once(tmpdir):
+    parser = make_parser(tmpdir)
+    properties, tags = parser.resolve_resource("queue")
+    properties_again, _ = parser.resolve_resource("queue")
+    assert properties == properties_again == {
+        "queue_name": "jobs-dev", "region": "ap-southeast-2", "delay_seconds": 5
+    }
+    assert tags == {"Environment": "dev"}
+
+def test_resolve_resource_uses_upstream_snapshot(tmpdir):
+    parser = make_parser(tmpdir)
+    assert parser.dependencies["worker"] == ["queue"]
+    unresolved, _ = parser.resolve_resource("worker")
+    assert unresolved["environment"]["QUEUE_URL"] == "${resources.queue.properties.url}"
+    outputs = {"queue": {"properties": {"url": "https://sqs/jobs-dev"}}}
+    resolved, _ = parser.resolve_resource("worker", outputs)
+    assert resolved["environment"] == {"QUEUE_URL": "https://sqs/jobs-dev", "ARN": "${self.arn}"}
+    assert unresolved["environment"]["QUEUE_URL"] == "${resources.queue.properties.url}"
+
+def test_parser_reuses_cached_model_until_the_file_changes(tmpdir, monkeypatch):
+    parser = make_parser(tmpdir)
+    monkeypatch.setattr("strato_spin.core.parser.yaml.load", lambda *args, **kwargs: 1 / 0)
+    cached = make_parser(tmpdir)
+    assert dict(cached.dependencies) == dict(parser.dependencies) == {"worker": ["queue"]}
+    assert cached.resolve_resource("queue") == parser.resolve_resource("queue")
+    (tmpdir / "infra.yaml").write("\n# edited\n", mode="a")
+    with pytest.raises(ZeroDivisionError):
+        Parser(str(tmpdir / "infra.yaml"), None, flavour="dev")
+
+def test_parser_cache_is_json_and_skips_values_json_cannot_hold(tmpdir):
+    make_parser(tmpdir)
+    cache_files = list(user_cache_dir("infra").iterdir())
+    assert [path.suffix for path in cache_files] == [".json"]
+    cache_files[0].unlink()
+
+    infra_file = tmpdir / "dated.yaml"
+    infra_file.write("variables:\n  released: 2024-01-31\nresources: []\n")
+    assert Parser(str(infra_file), None).variables["released"] == datetime.date(2024, 1, 31)
+    assert list(user_cache_dir("infra").iterdir()) == []
+
+def test_resource_level_flavour_overrides_win_over_property_level(tmpdir):
+    infra_file = tmpdir / "infra.yaml"
+    infra_file.write("""
+resources:
+  - type: sqs_queue
+    name: queue
+    properties:
+      queue_name: jobs
+      delay_seconds: 0
+      flavours:
+        dev:
+          delay_seconds: 5
+          visibility_timeout: 10
+    flavours:
+      dev:
+        delay_seconds: 9
+    tags: {}
+""")
+    properties, _ = Parser(str(infra_file), None, flavour="dev").resolve_resource("queue")
+    assert properties == {"queue_name": "jobs-dev", "delay_seconds": 9, "visibility_timeout": 10}
+    properties, _ = Parser(str(infra_file), None, flavour="prod").resolve_resource("queue")
+    assert properties == {"queue_name": "jobs-prod", "delay_seconds": 0}
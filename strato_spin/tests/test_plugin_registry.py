@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+from strato_spin.core.plugin_registry import PluginRegistry
+
+def test_registry_imports_plugins_on_first_use():
+    registry = PluginRegistry()
+    registry.register_plugins()
+    assert registry.resource_types["azure"] == {}
+    resource_class = registry.get_resource_class("aws", "sqs_queue")
+    assert resource_class.__name__ == "SQSQueue"
+    assert registry.get_schema("aws", "sqs_queue")["required"] == ["queue_name"]
+    assert "function_app" in registry.plugin_paths["azure"]
+    assert registry.get_resource_class("aws", "missing") is None
+
+def test_cli_import_does_not_load_cloud_sdks():
+    code = (
+        "import sys, strato_spin.cli, strato_spin.core.deployer;"
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'boto3', 'botocore', 'azure', 'google'}))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+def test_registry_caches_manifest_with_extensions(tmpdir):
+    extensions = tmpdir.mkdir("extensions")
+    (extensions / "custom_queue.py").write(
+        "from strato_spin.resources.aws.sqs_queue.sqs_queue import SQSQueue\n"
+        "class CustomQueue(SQSQueue):\n"
+        "    resource_type = 'custom_queue'\n"
+    )
+    registry = PluginRegistry(str(extensions), cache_dir=str(tmpdir / "cache"))
+    registry.register_plugins()
+    assert registry.plugin_paths["aws"]["custom_queue"]["source"] == "extension"
+    assert len(list((tmpdir / "cache").listdir())) == 1
+
+    cached = PluginRegistry(str(extensions), cache_dir=str(tmpdir / "cache"))
+    cached._build_manifest = None
+    cached.register_plugins()
+    assert cached.get_schema("aws", "custom_queue")["required"] == ["queue_name"]
+    assert cached.get_resource_class("aws", "custom_queue").__name__ == "CustomQueue"
+
+    (extensions / "custom_queue.py").write("\n# changed\n", mode="a")
+    os.utime(str(extensions / "custom_queue.py"), ns=(0, 0))
+    PluginRegistry(str(extensions), cache_dir=str(tmpdir / "cache")).register_plugins()
+    assert len(list((tmpdir / "cache").listdir())) == 2
+
+def test_registry_does_not_cache_manifest_with_import_failures(tmpdir):
+    extensions = tmpdir.mkdir("broken_extensions")
+    (extensions / "needs_sdk.py").write("import missing_cloud_sdk\n")
+    PluginRegistry(str(extensions), cache_dir=str(tmpdir / "cache")).register_plugins()
+    assert not (tmpdir / "cache").exists() or (tmpdir / "cache").listdir() == []
+
+def test_extensions_can_import_sibling_modules(tmpdir):
+    extensions = tmpdir.mkdir("sibling_extensions")
+    (extensions / "common.py").write(
+        "from strato_spin.resources.aws.sqs_queue.sqs_queue import SQSQueue\n"
+        "class BaseQueue(SQSQueue):\n"
+        "    pass\n"
+    )
+    (extensions / "relative_queue.py").write(
+        "from .common import BaseQueue\n"
+        "class RelativeQueue(BaseQueue):\n"
+        "    resource_type = 'relative_queue'\n"
+    )
+    (extensions / "absolute_queue.py").write(
+        "import extensions.common\n"
+        "class AbsoluteQueue(extensions.common.BaseQueue):\n"
+        "    resource_type = 'absolute_queue'\n"
+    )
+    registry = PluginRegistry(str(extensions), cache_dir=str(tmpdir / "cache"))
+    registry.register_plugins()
+    assert registry.get_resource_class("aws", "relative_queue").__name__ == "RelativeQueue"
+    assert registry.get_resource_class("aws", "absolute_queue").__name__ == "AbsoluteQueue"
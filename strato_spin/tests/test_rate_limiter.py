@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+from botocore.hooks import HierarchicalEmitter
+from strato_spin.core.rate_limiter import RateLimiter, TokenBucket
+
+def test_token_bucket_backs_off_on_throttle_and_recovers():
+    bucket = TokenBucket(10)
+    bucket.on_throttle()
+    assert bucket.rate == 5
+    assert bucket.throttles == 1
+    bucket.on_success()
+    assert bucket.rate > 5
+    bucket.acquire()
+    assert bucket.calls == 1
+
+def test_rate_limiter_shares_bucket_per_service_and_reports_throttles():
+    limiter = RateLimiter(service_rates={"sqs": 7})
+    client = SimpleNamespace(meta=SimpleNamespace(
+        service_model=SimpleNamespace(service_name="sqs"),
+        region_name="ap-southeast-2",
+        account_id="123456789012",
+        events=HierarchicalEmitter()
+    ))
+    limiter.instrument_client(client)
+    bucket = limiter.bucket("sqs", "ap-southeast-2", "123456789012")
+    assert bucket.rate == 7
+
+    client.meta.events.emit("before-send.sqs.GetQueueUrl", request=None)
+    throttled = (None, {"Error": {"Code": "ThrottlingException"}})
+    client.meta.events.emit("needs-retry.sqs.GetQueueUrl", response=throttled, attempts=1)
+    assert bucket.calls == 1
+    assert bucket.rate == 3.5
+    assert limiter.report() == {"sqs": 1}
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from strato_spin.core.scheduler import AsyncDagScheduler, DagScheduler, Deferred
+
+def test_scheduler_starts_dependents_without_group_barrier():
+    dependencies = {"slow": [], "fast": [], "after_fast": ["fast"]}
+    finished = []
+    lock = threading.Lock()
+
+    def task(node):
+        if node == "slow":
+            time.sleep(0.3)
+        with lock:
+            finished.append(node)
+        return True
+
+    results = DagScheduler(dependencies, max_workers=2).run(["slow", "fast", "after_fast"], task)
+    assert results == {"slow": True, "fast": True, "after_fast": True}
+    assert finished.index("after_fast") < finished.index("slow")
+
+def test_scheduler_continues_independent_branches():
+    dependencies = {"a": [], "b": ["a"], "c": []}
+    results = DagScheduler(dependencies, max_workers=1, fail_fast=False).run(
+        ["a", "b", "c"], lambda node: node != "a"
+    )
+    assert results == {"a": False, "b": None, "c": True}
+
+def test_scheduler_fail_fast_skips_unstarted():
+    dependencies = {"a": [], "b": [], "c": ["b"]}
+    results = DagScheduler(dependencies, max_workers=1).run(["a", "b", "c"], lambda node: node != "a")
+    assert results == {"a": False, "b": None, "c": None}
+
+def test_scheduler_lane_limit_does_not_block_other_lanes():
+    dependencies = {"heavy1": [], "heavy2": [], "cheap": []}
+    lanes = {"heavy1": ["type:lambda_function"], "heavy2": ["type:lambda_function"], "cheap": ["type:s3_upload"]}
+    active = {"heavy": 0, "max_heavy": 0}
+    finished = []
+    lock = threading.Lock()
+
+    def task(node):
+        heavy = node.startswith("heavy")
+        with lock:
+            if heavy:
+                active["heavy"] += 1
+                active["max_heavy"] = max(active["max_heavy"], active["heavy"])
+        time.sleep(0.1 if heavy else 0)
+        with lock:
+            if heavy:
+                active["heavy"] -= 1
+            finished.append(node)
+        return True
+
+    scheduler = DagScheduler(dependencies, max_workers=4, lanes=lanes, lane_limits={"type:lambda_function": 1})
+    results = scheduler.run(["heavy1", "heavy2", "cheap"], task)
+    assert all(results.values())
+    assert active["max_heavy"] == 1
+    assert finished[0] == "cheap"
+
+def test_async_scheduler_skips_dependents_of_failures():
+    dependencies = {"a": [], "b": ["a"], "c": []}
+
+    async def task(node):
+        await asyncio.sleep(0)
+        return node != "a"
+
+    scheduler = AsyncDagScheduler(dependencies, fail_fast=False, lane_limits={"x": 1}, lanes={"a": ["x"], "c": ["x"]})
+    results = asyncio.run(scheduler.run(["a", "b", "c"], task))
+    assert results == {"a": False, "b": None, "c": True}
+
+def test_scheduler_deferred_node_frees_its_worker():
+    dependencies = {"waiting": [], "other": [], "after": ["waiting"]}
+    settled = Future()
+    order = []
+
+    def task(node):
+        order.append(node)
+        if node == "waiting":
+            return Deferred(settled, lambda future: order.append("resumed") or future.result())
+        if node == "other":
+            settled.set_result(True)
+        return True
+
+    results = DagScheduler(dependencies, max_workers=1).run(["waiting", "other", "after"], task)
+    assert results == {"waiting": True, "other": True, "after": True}
+    assert order == ["waiting", "other", "resumed", "after"]
+
+def test_scheduler_resume_holds_lanes_and_sees_failed_waits():
+    dependencies = {"waiting": [], "other": []}
+    lanes = {"waiting": ["type:lambda_function"], "other": ["type:lambda_function"]}
+    failed_wait = Future()
+    failed_wait.set_exception(TimeoutError("never settled"))
+    active = {"now": 0, "max": 0}
+    errors = []
+    lock = threading.Lock()
+
+    def occupy(result):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        return result
+
+    def resume(future):
+        try:
+            return occupy(future.result())
+        except TimeoutError as e:
+            errors.append(str(e))
+            return occupy(False)
+
+    def task(node):
+        if node == "waiting":
+            return Deferred(failed_wait, resume)
+        return occupy(True)
+
+    scheduler = DagScheduler(
+        dependencies, max_workers=4, fail_fast=False, lanes=lanes, lane_limits={"type:lambda_function": 1}
+    )
+    assert scheduler.run(["waiting", "other"], task) == {"waiting": False, "other": True}
+    assert errors == ["never settled"]
+    assert active["max"] == 1
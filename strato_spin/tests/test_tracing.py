@@ -0,0 +1,34 @@
+import json
+from strato_spin.core.tracing import Tracer
+
+def test_tracer_writes_chrome_trace_and_summary(tmpdir):
+    tracer = Tracer()
+    with tracer.span("ignored"):
+        pass
+    assert tracer.events == []
+
+    tracer.enable()
+    with tracer.span("bucket", "resource"):
+        with tracer.span("create", "phase", resource="bucket"):
+            pass
+    trace_file = tmpdir / "trace.json"
+    tracer.write_chrome_trace(str(trace_file))
+    events = json.loads(trace_file.read())["traceEvents"]
+    assert [e["name"] for e in events] == ["create", "bucket"]
+    assert all(e["ph"] == "X" for e in events)
+    assert "bucket" in tracer.summary()
+
+def test_tracer_merges_events_exported_by_another_tracer():
+    worker = Tracer()
+    worker.enable()
+    with worker.span("package_lambda", "lambda"):
+        pass
+    tracer = Tracer()
+    tracer.merge(worker.export())
+    assert tracer.events == []
+
+    tracer.enable()
+    tracer.merge(worker.export())
+    assert [e["name"] for e in tracer.events] == ["package_lambda"]
+    # The worker started first, so its span lands before this tracer's origin
+    assert tracer.events[0]["ts"] < worker.events[0]["ts"]
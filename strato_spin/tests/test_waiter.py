@@ -0,0 +1,49 @@
+import pytest
+from strato_spin.core.waiter import Pending, Poller
+
+def test_poller_backs_off_and_leaves_follow_up_steps_to_the_caller():
+    checks = []
+    states = iter(["CREATING", "CREATING", "ACTIVE"])
+
+    def describe():
+        checks.append("table")
+        return next(states)
+
+    follow_up = Pending("update", lambda: checks.append("update") or "done", lambda state: state == "done", interval=0)
+    pending = Pending("table", describe, lambda state: state == "ACTIVE", then=lambda: follow_up, interval=0.01)
+    poller = Poller()
+    try:
+        assert poller.submit(pending).result(timeout=5) is True
+    finally:
+        poller.stop()
+    assert checks == ["table", "table", "table"]
+
+def test_poller_fails_the_future_on_timeout():
+    poller = Poller()
+    try:
+        future = poller.submit(Pending("never", lambda: False, interval=0.01, timeout=0.05))
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+    finally:
+        poller.stop()
+
+def test_poller_stop_resolves_every_outstanding_future():
+    import threading
+    checking = threading.Event()
+    release = threading.Event()
+
+    def describe():
+        checking.set()
+        release.wait(5)
+        return False
+
+    poller = Poller()
+    in_check = poller.submit(Pending("slow", describe, interval=0))
+    queued = poller.submit(Pending("later", lambda: False, interval=60))
+    assert checking.wait(5)
+    stopper = threading.Thread(target=poller.stop)
+    stopper.start()
+    release.set()
+    stopper.join(5)
+    # The check that was running reschedules after stop() began, and is cancelled rather than lost
+    assert in_check.cancelled() and queued.cancelled()